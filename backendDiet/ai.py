@@ -1,11 +1,18 @@
 # backend/ai.py
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple, Any, Union
 import os
 import json
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import deque
+from functools import lru_cache
+import numpy as np
 from dotenv import load_dotenv
+from catalog import MealCatalog, load_catalog
+from nutrition import macro_targets
 from logging_config import logger
 
 load_dotenv()
@@ -24,6 +31,14 @@ if OPENAI_API_KEY:
     except Exception:
         _HAS_OPENAI = False
 
+# Weekly plans: LLM calls in flight per request, and the overall budget
+# (kept under the frontend's 30 s request timeout)
+WEEKLY_CONCURRENCY = int(os.getenv("WEEKLY_CONCURRENCY", "4"))
+WEEKLY_DEADLINE_S = float(os.getenv("WEEKLY_DEADLINE_S", "25"))
+WEEKLY_MODE = os.getenv("WEEKLY_MODE", "batched")  # batched / parallel
+# Below this much time left, a per-day LLM call can't finish: use the meal DB
+WEEKLY_MIN_CALL_S = float(os.getenv("WEEKLY_MIN_CALL_S", "5"))
+
 
 # -----------------------------
 # Helpers
@@ -76,7 +91,7 @@ def _contains_any(text: str, keywords: List[str]) -> bool:
 # -----------------------------
 # Real app pattern: start with curated meals; AI can propose variants.
 
-MEAL_DB: List[Dict] = [
+STARTER_MEALS: List[Dict] = [
     # Breakfast
     {
         "meal_type": "breakfast",
@@ -138,6 +153,18 @@ MEAL_DB: List[Dict] = [
     },
 ]
 
+# Every selection path reads MEAL_DB, a columnar MealCatalog (catalog.py):
+# the catalog at MEAL_CATALOG_PATH (a built directory is memory-mapped), or
+# the starter meals above. MEAL_DB[i] is still a plain meal dict.
+MEAL_CATALOG_PATH = os.getenv("MEAL_CATALOG_PATH")
+MEAL_DB: MealCatalog = (
+    load_catalog(MEAL_CATALOG_PATH) if MEAL_CATALOG_PATH else MealCatalog.from_meals(STARTER_MEALS)
+)
+
+# A pool is either meal IDs into MEAL_DB (what candidate_pool returns) or a
+# list of meal dicts (AI output, client payloads)
+MealPool = Union[np.ndarray, List[Dict]]
+
 
 DIET_RULES = {
     "vegetarian": {"forbid": ["chicken", "turkey", "beef", "fish", "salmon"]},
@@ -151,6 +178,116 @@ DIET_RULES = {
 # Compliance checks (real-app safety)
 # -----------------------------
 
+# Allergy strings compiled into the matcher up front; anything else a user
+# types is still checked, just with a direct scan.
+COMMON_ALLERGENS = (
+    "peanuts", "tree nuts", "nuts", "eggs", "egg", "dairy", "milk", "gluten",
+    "wheat", "soy", "fish", "shellfish", "sesame",
+)
+
+
+class _TermMatcher:
+    """
+    Aho-Corasick automaton over a fixed term list. match(text) returns the
+    bitmask of terms occurring in text as substrings, in one pass.
+    """
+
+    def __init__(self, terms: List[str]):
+        goto: List[Dict[str, int]] = [{}]
+        out = [0]
+        for bit, term in enumerate(terms):
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(0)
+                state = nxt
+            out[state] |= 1 << bit
+
+        # Breadth-first failure links; each state also reports its suffixes' terms
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if state else 0
+                out[nxt] |= out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def match(self, text: str) -> int:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = mask = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            mask |= out[state]
+        return mask
+
+
+_TERM_BITS: Dict[str, int] = {}
+_PREF_MASKS: Dict[str, int] = {}   # DIET_RULES key -> forbidden-term bits
+_MATCHER = _TermMatcher([])
+
+def compile_compliance_rules(extra_allergens: Tuple[str, ...] = ()) -> None:
+    """
+    Build the matcher over every DIET_RULES forbidden term and known
+    allergen. Called by rebuild_meal_index(); rerun after editing DIET_RULES.
+    """
+    global _TERM_BITS, _PREF_MASKS, _MATCHER
+
+    terms: Dict[str, int] = {}
+    for rule in DIET_RULES.values():
+        for t in rule.get("forbid", []):
+            terms.setdefault(_lower(t), len(terms))
+    for t in COMMON_ALLERGENS + tuple(extra_allergens):
+        if _lower(t):
+            terms.setdefault(_lower(t), len(terms))
+
+    pref_masks = {}
+    for pref, rule in DIET_RULES.items():
+        mask = 0
+        for t in rule.get("forbid", []):
+            mask |= 1 << terms[_lower(t)]
+        pref_masks[pref] = mask
+
+    _MATCHER = _TermMatcher(list(terms))
+    _TERM_BITS = terms
+    _PREF_MASKS = pref_masks
+    _meal_term_masks.cache_clear()
+
+@lru_cache(maxsize=4096)
+def _meal_term_masks(
+    name: str,
+    ingredients: Tuple[str, ...],
+    allergens: Tuple[str, ...],
+) -> Tuple[int, int, int]:
+    """
+    Matched-term bitmasks for one meal (cached by content):
+    (terms in the name, terms inside any ingredient, terms equal to an
+    ingredient or listed allergen).
+    """
+    in_name = _MATCHER.match(name)
+    in_ingredients = 0
+    for ing in ingredients:
+        in_ingredients |= _MATCHER.match(ing)
+    exact = 0
+    for t in set(ingredients) | set(allergens):
+        bit = _TERM_BITS.get(t)
+        if bit is not None:
+            exact |= 1 << bit
+    return in_name, in_ingredients, exact
+
 def diet_compliance_check(meal: Dict, profile: Dict) -> Tuple[bool, List[str]]:
     reasons: List[str] = []
     prefs_info = _normalize_prefs(profile)
@@ -158,19 +295,27 @@ def diet_compliance_check(meal: Dict, profile: Dict) -> Tuple[bool, List[str]]:
     allergies = prefs_info["allergies"]
 
     meal_name = _lower(meal.get("name", ""))
-    ingredients = [_lower(x) for x in meal.get("ingredients", [])]
-    allergens = {_lower(a) for a in meal.get("allergens", [])}
+    ingredients = tuple(_lower(x) for x in meal.get("ingredients", []))
+    allergens = tuple(sorted({_lower(a) for a in meal.get("allergens", [])}))
+    in_name, in_ingredients, exact = _meal_term_masks(meal_name, ingredients, allergens)
 
+    # Allergy: listed allergen, exact ingredient, or anywhere in the name
+    allergy_hits = in_name | exact
     for a in allergies:
-        if a and (a in allergens or a in ingredients or a in meal_name):
+        if not a:
+            continue
+        bit = _TERM_BITS.get(a)
+        if bit is not None:
+            hit = (allergy_hits >> bit) & 1
+        else:
+            hit = a in allergens or a in ingredients or a in meal_name
+        if hit:
             reasons.append(f"contains allergen: {a}")
 
+    # Preference: any forbidden term inside the name or an ingredient
+    forbidden_hits = in_name | in_ingredients
     for pref in prefs:
-        rule = DIET_RULES.get(pref)
-        if not rule:
-            continue
-        forbid = rule.get("forbid", [])
-        if _contains_any(meal_name, forbid) or any(any(f in ing for f in forbid) for ing in ingredients):
+        if forbidden_hits & _PREF_MASKS.get(pref, 0):
             reasons.append(f"conflicts with preference: {pref}")
 
     return (len(reasons) == 0), reasons
@@ -181,13 +326,11 @@ def diet_compliance_check(meal: Dict, profile: Dict) -> Tuple[bool, List[str]]:
 # -----------------------------
 
 def _find_by_name(name_lower: str) -> Optional[Dict]:
-    for m in MEAL_DB:
-        if _lower(m.get("name")) == name_lower:
-            return m
-    for m in MEAL_DB:
-        if name_lower in _lower(m.get("name")):
-            return m
-    return None
+    # Exact name first, then substring; first catalog match wins
+    ids = MEAL_DB.name_ids(name_lower)
+    if not len(ids):
+        ids = np.flatnonzero(MEAL_DB.name_contains(name_lower))
+    return MEAL_DB[int(ids[0])] if len(ids) else None
 
 def resolve_meal(meal_in: Any) -> Optional[Dict]:
     if meal_in is None:
@@ -227,7 +370,11 @@ def _matches_budget(meal: Dict, budget_level: str) -> bool:
         return True
     return cost <= 8.00
 
-def filter_meals_for_profile(pool: List[Dict], profile: Dict) -> List[Dict]:
+def filter_meals_for_profile(pool: MealPool, profile: Dict) -> MealPool:
+    if isinstance(pool, np.ndarray):
+        # Catalog IDs: one lookup into the profile's precomputed mask
+        return pool[_signature_pools(profile_signature(profile)).strict[pool]]
+
     budget = _normalize_budget(profile)
     out = []
     for m in pool:
@@ -239,60 +386,396 @@ def filter_meals_for_profile(pool: List[Dict], profile: Dict) -> List[Dict]:
         out.append(m)
     return out
 
-def apply_constraint(pool: List[Dict], constraint: Optional[str]) -> List[Dict]:
+# constraint -> (column, descending); ties keep pool order (stable sort)
+_CONSTRAINT_SORTS = {
+    "lower_calories": ("calories", False), "low_calories": ("calories", False),
+    "higher_protein": ("protein", True), "high_protein": ("protein", True),
+    "cheaper": ("cost_estimate", False), "low_cost": ("cost_estimate", False), "budget": ("cost_estimate", False),
+    "lower_sodium": ("sodium_mg", False), "low_sodium": ("sodium_mg", False),
+    "higher_fiber": ("fiber", True), "high_fiber": ("fiber", True),
+}
+_CONSTRAINT_EXCLUDE = {
+    "vegetarian": ["chicken", "turkey", "beef", "fish", "salmon"],
+    "vegan": ["chicken", "turkey", "beef", "fish", "salmon", "egg", "yogurt", "parmesan", "cheese", "honey"],
+}
+
+def _parse_constraint(c: str) -> List[Tuple[str, float]]:
+    """
+    "higher_protein and cheaper", "higher_protein,cheaper:2" ->
+    [(name, weight), ...]. Weights default to 1.
+    """
+    parts = []
+    for token in c.replace(" and ", ",").replace("+", ",").split(","):
+        name, _, weight = token.strip().partition(":")
+        if not name:
+            continue
+        try:
+            parts.append((name.strip(), float(weight) if weight else 1.0))
+        except ValueError:
+            parts.append((name.strip(), 1.0))
+    return parts
+
+def _pool_column(pool: MealPool, col: str) -> np.ndarray:
+    # int() semantics for nutrients, float for cost, as the original sorts used
+    if isinstance(pool, np.ndarray):
+        values = MEAL_DB.column(col)[pool].astype(np.float64)
+        return values if col == "cost_estimate" else np.trunc(values)
+    cast = float if col == "cost_estimate" else int
+    return np.array([cast(m.get(col, 0)) for m in pool], dtype=np.float64)
+
+def _take(pool: MealPool, positions: np.ndarray) -> MealPool:
+    if isinstance(pool, np.ndarray):
+        return pool[positions]
+    return [pool[i] for i in positions]
+
+def _smallest_k(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k smallest values, ordered exactly like
+    np.argsort(values, kind="stable")[:k], in O(n + k log k).
+    """
+    if k >= len(values):
+        return np.argsort(values, kind="stable")
+    kth = np.partition(values, k - 1)[k - 1]
+    below = np.flatnonzero(values < kth)
+    ties = np.flatnonzero(values == kth)[: k - len(below)]  # earliest ties win
+    sel = np.sort(np.concatenate((below, ties)))
+    return sel[np.argsort(values[sel], kind="stable")]
+
+def apply_constraint(pool: MealPool, constraint: Optional[str]) -> MealPool:
+    """
+    Narrow a pool by one constraint or a composite ("vegan and cheaper",
+    "higher_protein and cheaper:2"). Exclusions filter; ranking constraints
+    keep the best half, ranked by one column or, when combined, by a
+    weighted sum of per-column z-scores.
+    """
     c = _lower(constraint)
     if not c:
         return pool
 
-    if c in {"lower_calories", "low_calories"}:
-        return sorted(pool, key=lambda m: int(m.get("calories", 0)))[: max(1, len(pool)//2)]
-    if c in {"higher_protein", "high_protein"}:
-        return sorted(pool, key=lambda m: int(m.get("protein", 0)), reverse=True)[: max(1, len(pool)//2)]
-    if c in {"cheaper", "low_cost", "budget"}:
-        return sorted(pool, key=lambda m: float(m.get("cost_estimate", 0.0)))[: max(1, len(pool)//2)]
-    if c in {"lower_sodium", "low_sodium"}:
-        return sorted(pool, key=lambda m: int(m.get("sodium_mg", 0)))[: max(1, len(pool)//2)]
-    if c in {"higher_fiber", "high_fiber"}:
-        return sorted(pool, key=lambda m: int(m.get("fiber", 0)), reverse=True)[: max(1, len(pool)//2)]
-    if c in {"vegetarian"}:
-        return [m for m in pool if not _contains_any(m.get("name", ""), ["chicken", "turkey", "beef", "fish", "salmon"])]
-    if c in {"vegan"}:
-        return [m for m in pool if not _contains_any(m.get("name", ""), ["chicken", "turkey", "beef", "fish", "salmon", "egg", "yogurt", "parmesan", "cheese", "honey"])]
-    return pool
-
-def _seeded_choice(pool: List[Dict], seed: str) -> Dict:
-    if not pool:
+    parts = _parse_constraint(c)
+    for name, _w in parts:
+        words = _CONSTRAINT_EXCLUDE.get(name)
+        if not words:
+            continue
+        if isinstance(pool, np.ndarray):
+            hit = np.zeros(len(pool), dtype=bool)
+            for w in words:
+                hit |= MEAL_DB.name_contains(w, pool)
+            pool = pool[~hit]
+        else:
+            pool = [m for m in pool if not _contains_any(m.get("name", ""), words)]
+
+    ranks = [(_CONSTRAINT_SORTS[name], w) for name, w in parts if name in _CONSTRAINT_SORTS]
+    if not ranks:
+        return pool
+
+    half = max(1, len(pool)//2)
+    if len(ranks) == 1:
+        (col, descending), _w = ranks[0]
+        values = _pool_column(pool, col)
+        return _take(pool, _smallest_k(-values if descending else values, half))
+
+    # Composite: lower cost = higher score, so negate ascending columns
+    score = np.zeros(len(pool), dtype=np.float64)
+    for (col, descending), w in ranks:
+        values = _pool_column(pool, col)
+        std = values.std()
+        if std > 0:
+            z = (values - values.mean()) / std
+            score += w * (z if descending else -z)
+    return _take(pool, _smallest_k(-score, half))
+
+def _seeded_choice(pool: MealPool, seed: str) -> Dict:
+    if not len(pool):
         return {}
     rnd = random.Random(seed)
-    return rnd.choice(pool)
+    choice = rnd.choice(pool)
+    return MEAL_DB[int(choice)] if isinstance(pool, np.ndarray) else choice
+
+
+# -----------------------------
+# Meal catalog indexes
+# -----------------------------
+# Built once per catalog (set_meal_catalog() swaps catalogs and rebuilds).
+# Every index is a bool mask over MEAL_DB rows, computed column-wise: diet
+# rules run the term matcher over the ingredient vocabulary (not per meal)
+# plus one vectorized substring pass over names per forbidden term.
+
+_MEAL_BY_TYPE: Dict[str, np.ndarray] = {}
+_MEAL_DIET_OK: Dict[str, np.ndarray] = {}      # DIET_RULES key -> compliant meals
+_MEAL_BUDGET_OK: Dict[str, np.ndarray] = {}    # low/medium/high -> affordable meals
+_MEAL_ALLERGY_HITS: Dict[str, np.ndarray] = {} # allergy string -> conflicting meals
+_ING_VOCAB_BY_LOWER: Dict[str, List[int]] = {}
+_ALLERGEN_VOCAB_BY_LOWER: Dict[str, List[int]] = {}
+
+_ALLERGY_MEMO_MAX = 256  # lazily indexed user allergy strings
+
+def _vocab_hits(by_lower: Dict[str, List[int]], size: int, term: str) -> np.ndarray:
+    hits = np.zeros(size, dtype=bool)
+    hits[by_lower.get(term, [])] = True
+    return hits
+
+def _scan_allergy_hits(allergy: str) -> np.ndarray:
+    # Same rule as diet_compliance_check: listed allergen, exact ingredient,
+    # or anywhere in the name
+    return (
+        MEAL_DB.any_allergen(_vocab_hits(_ALLERGEN_VOCAB_BY_LOWER, len(MEAL_DB.allergen_vocab), allergy))
+        | MEAL_DB.any_ingredient(_vocab_hits(_ING_VOCAB_BY_LOWER, len(MEAL_DB.ingredient_vocab), allergy))
+        | MEAL_DB.name_contains(allergy)
+    )
+
+def rebuild_meal_index() -> None:
+    global _MEAL_BY_TYPE, _MEAL_DIET_OK, _MEAL_BUDGET_OK, _MEAL_ALLERGY_HITS
+    global _ING_VOCAB_BY_LOWER, _ALLERGEN_VOCAB_BY_LOWER
+
+    cat = MEAL_DB
+    compile_compliance_rules(tuple(_lower(a) for a in cat.allergen_vocab))
+
+    ing_by_lower: Dict[str, List[int]] = {}
+    for i, v in enumerate(cat.ingredient_vocab):
+        ing_by_lower.setdefault(_lower(v), []).append(i)
+    allergen_by_lower: Dict[str, List[int]] = {}
+    for i, v in enumerate(cat.allergen_vocab):
+        allergen_by_lower.setdefault(_lower(v), []).append(i)
+
+    # Forbidden terms per vocabulary entry, then per meal via the CSR rows
+    ing_terms = [_MATCHER.match(_lower(v)) for v in cat.ingredient_vocab]
+    diet_ok = {}
+    for pref, rule in DIET_RULES.items():
+        forbid_mask = _PREF_MASKS.get(pref, 0)
+        bad = cat.any_ingredient(np.array([bool(t & forbid_mask) for t in ing_terms], dtype=bool))
+        for term in rule.get("forbid", []):
+            bad |= cat.name_contains(term)
+        diet_ok[pref] = ~bad
+
+    cost = cat.cost
+    budget_ok = {
+        "low": cost <= 4.75,
+        "medium": cost <= 8.00,
+        "high": np.ones(len(cat), dtype=bool),
+    }  # same thresholds as _matches_budget
+
+    _ING_VOCAB_BY_LOWER = ing_by_lower
+    _ALLERGEN_VOCAB_BY_LOWER = allergen_by_lower
+    _MEAL_BY_TYPE = {t: cat.type_mask(t) for t in cat.meal_types}
+    _MEAL_DIET_OK = diet_ok
+    _MEAL_BUDGET_OK = budget_ok
+    _MEAL_ALLERGY_HITS = {}
+    _signature_pools.cache_clear()
+
+def set_meal_catalog(catalog: MealCatalog) -> None:
+    """
+    Swap the meal catalog and rebuild every index and pool cache.
+    """
+    global MEAL_DB
+    MEAL_DB = catalog
+    rebuild_meal_index()
+
+def _allergy_hits(allergy: str) -> np.ndarray:
+    hits = _MEAL_ALLERGY_HITS.get(allergy)
+    if hits is None:
+        hits = _scan_allergy_hits(allergy)
+        if len(_MEAL_ALLERGY_HITS) < _ALLERGY_MEMO_MAX:
+            _MEAL_ALLERGY_HITS[allergy] = hits
+    return hits
+
+# Pools depend only on the normalized prefs, allergies and budget tier, so
+# profiles are reduced to that signature and their pools memoized
+CANDIDATE_POOL_CACHE_SIZE = int(os.getenv("CANDIDATE_POOL_CACHE_SIZE", "256"))
+
+ProfileSignature = Tuple[FrozenSet[str], FrozenSet[str], str]
+
+class _ProfilePools(NamedTuple):
+    strict: np.ndarray                                   # bool mask: rules + budget
+    by_type: Dict[str, Tuple[np.ndarray, np.ndarray]]    # meal_type -> (strict IDs, relaxed IDs)
+
+def profile_signature(profile: Dict) -> ProfileSignature:
+    prefs_info = _normalize_prefs(profile)
+    return (
+        frozenset(prefs_info["prefs"]),
+        frozenset(a for a in prefs_info["allergies"] if a),
+        _normalize_budget(profile),
+    )
+
+def _frozen_ids(mask: np.ndarray) -> np.ndarray:
+    ids = np.flatnonzero(mask).astype(np.int32)
+    ids.setflags(write=False)  # shared by every caller with this signature
+    return ids
+
+@lru_cache(maxsize=CANDIDATE_POOL_CACHE_SIZE)
+def _signature_pools(signature: ProfileSignature) -> _ProfilePools:
+    prefs, allergies, budget = signature
+    safe = np.ones(len(MEAL_DB), dtype=bool)
+    for pref in prefs:
+        ok = _MEAL_DIET_OK.get(pref)
+        if ok is not None:
+            safe &= ok
+    for a in allergies:
+        safe &= ~_allergy_hits(a)
+    strict = safe & _MEAL_BUDGET_OK.get(budget, True)
+
+    by_type = {}
+    for meal_type, type_mask in _MEAL_BY_TYPE.items():
+        strict_ids = _frozen_ids(strict & type_mask)
+        if len(strict_ids):
+            relaxed_ids = strict_ids
+        else:
+            safe_of_type = safe & type_mask
+            relaxed_ids = _frozen_ids(safe_of_type if safe_of_type.any() else type_mask)
+        by_type[meal_type] = (strict_ids, relaxed_ids)
+    return _ProfilePools(strict, by_type)
+
+def candidate_pool(meal_type: str, profile: Dict, relax: bool = False) -> np.ndarray:
+    """
+    IDs (catalog order, read-only) of meals of meal_type that pass the
+    profile's diet/allergy rules and budget, i.e. filter_meals_for_profile
+    over that type. relax=True falls back to diet/allergy only, then to
+    every meal of the type.
+    """
+    pools = _signature_pools(profile_signature(profile)).by_type.get(meal_type)
+    if pools is None:
+        return np.empty(0, dtype=np.int32)
+    return pools[1] if relax else pools[0]
+
+
+rebuild_meal_index()
+
+
+# -----------------------------
+# Daily plan optimizer
+# -----------------------------
+# Picks breakfast x lunch x dinner to minimize the weighted relative L1
+# deviation from nutrition.macro_targets within a daily budget. Each slot is
+# shortlisted to the meals closest to a third of the targets, breakfast x
+# lunch pairs are scored as one array, and dinners are scanned per block of
+# pairs only inside the calorie window that can still beat the best day.
+
+OPTIMIZER_SLOT_CANDIDATES = int(os.getenv("OPTIMIZER_SLOT_CANDIDATES", "256"))
+OPTIMIZER_PAIR_BLOCK = 512
+
+# (catalog column, macro_targets key, weight)
+OPTIMIZER_WEIGHTS = (
+    ("calories", "calories", 1.0),
+    ("protein", "protein_g", 1.0),
+    ("carbs", "carbs_g", 0.5),
+    ("fat", "fat_g", 0.5),
+)
+DAY_BUDGET = {"low": 3 * 4.75, "medium": 3 * 8.00, "high": float("inf")}  # 3x the per-meal caps
+_OPTIMIZER_EPS = 1e-9
+
+def _macro_features(ids: np.ndarray, targets: Dict) -> np.ndarray:
+    # (n, k) per-meal macros scaled so the day's goal is the weight vector
+    return np.stack([
+        np.trunc(MEAL_DB.column(col)[ids].astype(np.float64)) * (w / max(1.0, float(targets[key])))
+        for col, key, w in OPTIMIZER_WEIGHTS
+    ], axis=1)
+
+def day_deviation(meal_ids: Tuple[int, int, int], targets: Dict) -> float:
+    """
+    Weighted relative deviation of a day from the macro targets (0 = exact).
+    """
+    goal = np.array([w for _c, _k, w in OPTIMIZER_WEIGHTS])
+    return float(np.abs(_macro_features(np.asarray(meal_ids), targets).sum(axis=0) - goal).sum())
+
+def optimize_day(
+    profile: Dict,
+    seed: str,
+    pools: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+) -> Optional[Tuple[int, int, int]]:
+    """
+    Best (breakfast, lunch, dinner) meal IDs for the profile's macro targets
+    and daily budget. The seeded pick generate_meal_plan would make is the
+    starting bound, so the result is never worse than it; exact ties are
+    broken with `seed`. Returns None when a slot has no candidates.
+    """
+    if pools is None:
+        pools = tuple(candidate_pool(t, profile, relax=True) for t in ("breakfast", "lunch", "dinner"))
+    if not all(len(p) for p in pools):
+        return None
+
+    targets = macro_targets(profile)
+    goal = np.array([w for _c, _k, w in OPTIMIZER_WEIGHTS])
+    cap = DAY_BUDGET.get(_normalize_budget(profile), DAY_BUDGET["medium"])
+
+    # Incumbent: the default seeded day, if it fits the budget
+    default = tuple(int(random.Random(seed + s).choice(p)) for s, p in zip((":b", ":l", ":d"), pools))
+    best = day_deviation(default, targets) if float(MEAL_DB.cost[list(default)].sum()) <= cap else float("inf")
+
+    slots = []
+    for ids in pools:
+        feats = _macro_features(ids, targets)
+        if len(ids) > OPTIMIZER_SLOT_CANDIDATES:
+            keep = np.sort(_smallest_k(np.abs(feats - goal / 3).sum(axis=1), OPTIMIZER_SLOT_CANDIDATES))
+            ids, feats = ids[keep], feats[keep]
+        slots.append((ids, feats, MEAL_DB.cost[ids]))
+    (b_ids, b_f, b_c), (l_ids, l_f, l_c), (d_ids, d_f, d_c) = slots
+
+    # Dinners sorted by (scaled) calories for the window lookups
+    order = np.argsort(d_f[:, 0], kind="stable")
+    d_ids, d_f, d_c = d_ids[order], d_f[order], d_c[order]
+    d_cal = np.ascontiguousarray(d_f[:, 0])
+
+    # What each breakfast x lunch pair leaves for dinner
+    need = (goal - b_f[:, None, :] - l_f[None, :, :]).reshape(-1, goal.size)
+    pair_c = (b_c[:, None] + l_c[None, :]).reshape(-1)
+    # Lower bound: distance from the need to the dinners' per-macro range
+    lb = (np.maximum(need - d_f.max(axis=0), 0) + np.maximum(d_f.min(axis=0) - need, 0)).sum(axis=1)
+    pairs = np.flatnonzero((pair_c + d_c.min() <= cap) & (lb <= best + _OPTIMIZER_EPS))
+    pairs = pairs[np.argsort(need[pairs, 0])]
+
+    ties: List[Tuple[int, int]] = []
+    for start in range(0, len(pairs), OPTIMIZER_PAIR_BLOCK):
+        blk = pairs[start:start + OPTIMIZER_PAIR_BLOCK]
+        blk = blk[lb[blk] <= best + _OPTIMIZER_EPS]
+        if not len(blk):
+            continue
+        # |calorie gap| alone must stay within the best deviation
+        lo = int(np.searchsorted(d_cal, need[blk, 0].min() - best - _OPTIMIZER_EPS, "left"))
+        hi = int(np.searchsorted(d_cal, need[blk, 0].max() + best + _OPTIMIZER_EPS, "right"))
+        if lo >= hi:
+            continue
+        score = np.abs(need[blk, None, :] - d_f[None, lo:hi, :]).sum(axis=2)
+        score[pair_c[blk][:, None] + d_c[None, lo:hi] > cap] = np.inf
+        m = float(score.min())
+        if m == np.inf:
+            continue
+        if m < best - _OPTIMIZER_EPS:
+            best, ties = m, []
+        if m <= best + _OPTIMIZER_EPS:
+            hit_p, hit_d = np.nonzero(score <= best + _OPTIMIZER_EPS)
+            ties.extend(zip(blk[hit_p].tolist(), (hit_d + lo).tolist()))
+
+    if not ties:
+        return default
+    p, d = random.Random(seed + ":opt").choice(sorted(ties))
+    return int(b_ids[p // len(l_ids)]), int(l_ids[p % len(l_ids)]), int(d_ids[d])
 
 
 # -----------------------------
 # AI calls (optional real AI)
 # -----------------------------
 
-def _openai_generate_meal_ideas(profile: Dict) -> Optional[List[Dict]]:
+def _prompt_constraints(profile: Dict) -> Dict:
+    prefs_info = _normalize_prefs(profile)
+    return {
+        "goal": _normalize_goal(profile),
+        "budget_level": _normalize_budget(profile),
+        "dietary_preferences": sorted(list(prefs_info["prefs"])),
+        "allergies": sorted(list(prefs_info["allergies"])),
+    }
+
+def _openai_generate_meal_ideas(profile: Dict, timeout: Optional[float] = None) -> Optional[List[Dict]]:
     """
     Real AI hook: return a 3-meal plan JSON.
     If OpenAI is unavailable, return None and we fallback to MEAL_DB logic.
+    `timeout` (seconds) bounds the HTTP call.
     """
     if not _HAS_OPENAI or _client is None:
         return None
 
-    prefs_info = _normalize_prefs(profile)
-    prefs = sorted(list(prefs_info["prefs"]))
-    allergies = sorted(list(prefs_info["allergies"]))
-    goal = _normalize_goal(profile)
-    budget = _normalize_budget(profile)
-
     prompt = {
         "task": "Generate a 1-day meal plan",
-        "constraints": {
-            "goal": goal,
-            "budget_level": budget,
-            "dietary_preferences": prefs,
-            "allergies": allergies,
-        },
+        "constraints": _prompt_constraints(profile),
         "required_format": [
             {
                 "meal": "Breakfast",
@@ -314,6 +797,7 @@ def _openai_generate_meal_ideas(profile: Dict) -> Optional[List[Dict]]:
         resp = _client.responses.create(
             model="gpt-4.1-mini",
             input=f"Return ONLY valid JSON.\n\n{json.dumps(prompt)}",
+            **({"timeout": timeout} if timeout is not None else {}),
         )
         text = resp.output_text.strip()
         data = json.loads(text)
@@ -324,18 +808,110 @@ def _openai_generate_meal_ideas(profile: Dict) -> Optional[List[Dict]]:
         return None
 
 
+_AI_MEAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "meal": {"type": "string", "enum": ["Breakfast", "Lunch", "Dinner"]},
+        "name": {"type": "string"},
+        "ingredients": {"type": "array", "items": {"type": "string"}},
+        "calories": {"type": "integer"},
+        "protein": {"type": "integer"},
+        "carbs": {"type": "integer"},
+        "fat": {"type": "integer"},
+        "fiber": {"type": "integer"},
+        "sugar": {"type": "integer"},
+        "sodium_mg": {"type": "integer"},
+        "cost_estimate": {"type": "number"},
+    },
+    "required": [
+        "meal", "name", "ingredients", "calories", "protein", "carbs",
+        "fat", "fiber", "sugar", "sodium_mg", "cost_estimate",
+    ],
+    "additionalProperties": False,
+}
+
+_AI_WEEK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "days": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "day": {"type": "integer"},
+                    "meals": {"type": "array", "items": _AI_MEAL_SCHEMA},
+                },
+                "required": ["day", "meals"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["days"],
+    "additionalProperties": False,
+}
+
+def _openai_generate_days(profile: Dict, n_days: int, timeout: Optional[float] = None) -> Optional[List[List[Any]]]:
+    """
+    One structured request for an n-day plan. Returns the raw meals per day
+    (index 0 = day 1; a missing day is []) or None if the call or the
+    top-level shape fails. Meals are validated by the caller.
+    """
+    if not _HAS_OPENAI or _client is None:
+        return None
+
+    prompt = {
+        "task": f"Generate a {n_days}-day meal plan with Breakfast, Lunch and Dinner each day; vary meals across days",
+        "constraints": _prompt_constraints(profile),
+        "days": n_days,
+    }
+
+    try:
+        resp = _client.responses.create(
+            model="gpt-4.1-mini",
+            input=f"Return ONLY valid JSON.\n\n{json.dumps(prompt)}",
+            text={"format": {"type": "json_schema", "name": "meal_plan_days", "schema": _AI_WEEK_SCHEMA, "strict": True}},
+            **({"timeout": timeout} if timeout is not None else {}),
+        )
+        data = json.loads(resp.output_text.strip())
+    except Exception:
+        return None
+
+    entries = data.get("days") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return None
+    days: List[List[Any]] = [[] for _ in range(n_days)]
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not isinstance(entry.get("meals"), list):
+            continue
+        day = entry.get("day", i + 1)
+        if isinstance(day, int) and 1 <= day <= n_days and not days[day - 1]:
+            days[day - 1] = entry["meals"]
+    return days
+
+
 # -----------------------------
 # Public feature functions
 # -----------------------------
 
-def generate_meal_plan(user_profile: Dict) -> List[Dict]:
+def generate_meal_plan(
+    user_profile: Dict,
+    optimize: bool = False,
+    ai_timeout: Optional[float] = None,
+) -> List[Dict]:
     logger.info("generate_meal_plan called")
     """
     Real-app behavior:
+    - optimize=True: catalog day closest to the macro targets (optimize_day)
     - Try AI (if configured)
     - Otherwise use curated DB + rules
     """
-    ai_plan = _openai_generate_meal_ideas(user_profile)
+    seed = _lower(user_profile.get("user_id") or user_profile.get("email") or "default")
+    if optimize:
+        best = optimize_day(user_profile, seed)
+        if best:
+            return [_meal_payload(label, MEAL_DB[i]) for label, i in zip(("Breakfast", "Lunch", "Dinner"), best)]
+
+    ai_plan = _openai_generate_meal_ideas(user_profile, timeout=ai_timeout)
     if ai_plan:
         logger.info("AI-generated meal plan accepted")
         # Ensure basic safety check before returning
@@ -348,42 +924,135 @@ def generate_meal_plan(user_profile: Dict) -> List[Dict]:
             return safe[:3]
         # fall back if AI output conflicts with allergies/prefs
         # (keeps UX predictable)
-    # DB fallback:
-    seed = _lower(user_profile.get("user_id") or user_profile.get("email") or "default")
+    return _db_meal_plan(user_profile, seed)
 
-    b_pool = filter_meals_for_profile([m for m in MEAL_DB if m["meal_type"] == "breakfast"], user_profile)
-    l_pool = filter_meals_for_profile([m for m in MEAL_DB if m["meal_type"] == "lunch"], user_profile)
-    d_pool = filter_meals_for_profile([m for m in MEAL_DB if m["meal_type"] == "dinner"], user_profile)
 
-    # If too strict, relax to diet/allergy only (budget relaxed)
-    def relax(pool: List[Dict], meal_type: str) -> List[Dict]:
-        if pool:
-            return pool
-        raw = [m for m in MEAL_DB if m["meal_type"] == meal_type]
-        safe = []
-        for m in raw:
-            ok, _ = diet_compliance_check(m, user_profile)
-            if ok:
-                safe.append(m)
-        return safe or raw
+# (label, meal_type, seed suffix)
+_DAY_SLOTS = (("Breakfast", "breakfast", ":b"), ("Lunch", "lunch", ":l"), ("Dinner", "dinner", ":d"))
 
-    b_pool = relax(b_pool, "breakfast")
-    l_pool = relax(l_pool, "lunch")
-    d_pool = relax(d_pool, "dinner")
+def _db_slot_meal(user_profile: Dict, seed: str, slot: Tuple[str, str, str]) -> Dict:
+    # DB fallback; if too strict, relax to diet/allergy only (budget relaxed)
+    label, meal_type, suffix = slot
+    return _meal_payload(label, _seeded_choice(candidate_pool(meal_type, user_profile, relax=True), seed + suffix))
 
-    return [
-        _meal_payload("Breakfast", _seeded_choice(b_pool, seed + ":b")),
-        _meal_payload("Lunch", _seeded_choice(l_pool, seed + ":l")),
-        _meal_payload("Dinner", _seeded_choice(d_pool, seed + ":d")),
-    ]
 
+def _db_meal_plan(user_profile: Dict, seed: str) -> List[Dict]:
+    return [_db_slot_meal(user_profile, seed, slot) for slot in _DAY_SLOTS]
 
-def generate_weekly_meal_plan(user_profile: Dict) -> List[Dict]:
-    week = []
+
+def _valid_ai_meal(label: str, meal: Any, profile: Dict) -> Optional[Dict]:
+    """
+    Normalized payload for one LLM meal, or None if it is malformed or
+    fails diet_compliance_check.
+    """
+    if not isinstance(meal, dict) or not str(meal.get("name") or "").strip():
+        return None
+    if not isinstance(meal.get("ingredients"), list):
+        return None
+    try:
+        payload = _meal_payload(label, meal)
+    except (TypeError, ValueError):
+        return None
+    ok, _ = diet_compliance_check(payload, profile)
+    return payload if ok else None
+
+
+def _batched_week(user_profile: Dict, days: List[Dict], timeout: float) -> Optional[List[Dict]]:
+    """
+    All days from one LLM request; slots that are missing, malformed or
+    non-compliant are backfilled from the meal DB with that day's seed.
+    """
+    raw = _openai_generate_days(user_profile, len(days), timeout=timeout)
+    if raw is None:
+        return None
+
+    week, backfilled = [], 0
+    for d, (profile, meals) in enumerate(zip(days, raw), 1):
+        # Match by the "meal" label; unlabeled meals fill slots in order
+        by_label = {_lower(m.get("meal")): m for m in meals if isinstance(m, dict) and m.get("meal")}
+        plan = []
+        for i, slot in enumerate(_DAY_SLOTS):
+            meal = by_label.get(slot[1], meals[i] if i < len(meals) and not by_label else None)
+            payload = _valid_ai_meal(slot[0], meal, profile)
+            if payload is None:
+                backfilled += 1
+                payload = _db_slot_meal(profile, _lower(profile["user_id"]), slot)
+            plan.append(payload)
+        week.append({"day": d, "meals": plan})
+    logger.info(f"batched weekly plan: {backfilled} of {len(days) * len(_DAY_SLOTS)} slots backfilled from meal DB")
+    return week
+
+
+def _week_profiles(user_profile: Dict) -> List[Dict]:
+    # Per-day user_id keeps each day's seed stable across requests
     base_id = _lower(user_profile.get("user_id") or "user")
-    for day in range(1, 8):
-        shifted = {**user_profile, "user_id": f"{base_id}-day{day}"}
-        week.append({"day": day, "meals": generate_meal_plan(shifted)})
+    return [{**user_profile, "user_id": f"{base_id}-day{day}"} for day in range(1, 8)]
+
+
+def _deadline_day(day: int, profile: Dict) -> Dict:
+    # Meal DB day for when the LLM budget ran out
+    return {"day": day, "meals": _db_meal_plan(profile, _lower(profile["user_id"])), "fallback": "deadline"}
+
+
+def generate_weekly_meal_plan(
+    user_profile: Dict,
+    mode: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    deadline_s: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Seven daily plans. With OpenAI configured:
+    - mode "batched": one LLM request for the whole week, failing slots
+      backfilled from the meal DB; if the request itself fails, the
+      parallel mode runs with the time left
+    - mode "parallel": one request per day (at most `concurrency` in
+      flight); any day not done by the deadline comes from the meal DB
+    Days that start with less than WEEKLY_MIN_CALL_S left skip the LLM.
+    Days filled from the meal DB for lack of time carry
+    "fallback": "deadline". Both modes keep each day's seed.
+    """
+    days = _week_profiles(user_profile)
+    if not _HAS_OPENAI:
+        # DB-only days are CPU-bound and fast; no point in threads
+        return [{"day": d, "meals": generate_meal_plan(p)} for d, p in enumerate(days, 1)]
+
+    concurrency = max(1, concurrency or WEEKLY_CONCURRENCY)
+    deadline = time.monotonic() + (deadline_s if deadline_s is not None else WEEKLY_DEADLINE_S)
+
+    if _lower(mode or WEEKLY_MODE) == "batched":
+        week = _batched_week(user_profile, days, timeout=max(0.1, deadline - time.monotonic()))
+        if week is not None:
+            return week
+
+    if deadline - time.monotonic() < WEEKLY_MIN_CALL_S:
+        # e.g. the batched call used up the budget: LLM calls would only time out
+        logger.info("weekly plan: no time left for per-day LLM calls; using meal DB")
+        return [_deadline_day(d, p) for d, p in enumerate(days, 1)]
+
+    def run(profile: Dict) -> Optional[List[Dict]]:
+        # The LLM call gives up at the deadline instead of holding a worker
+        left = deadline - time.monotonic()
+        if left < WEEKLY_MIN_CALL_S:
+            return None
+        return generate_meal_plan(profile, ai_timeout=left)
+
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="weekly-plan")
+    try:
+        futures = [pool.submit(run, p) for p in days]
+        wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    week = []
+    for d, (profile, fut) in enumerate(zip(days, futures), 1):
+        meals = None
+        if fut.done() and not fut.cancelled() and fut.exception() is None:
+            meals = fut.result()
+        if meals is None:
+            logger.info(f"weekly plan day {d} missed the deadline; using meal DB")
+            week.append(_deadline_day(d, profile))
+        else:
+            week.append({"day": d, "meals": meals})
     return week
 
 
@@ -399,11 +1068,12 @@ def meal_regenerate(payload: Dict) -> Dict:
     else:
         meal_type = "dinner"; label = "Dinner"
 
-    pool = filter_meals_for_profile([m for m in MEAL_DB if m["meal_type"] == meal_type], profile)
-    pool = apply_constraint(pool, constraint) or pool
+    pool = candidate_pool(meal_type, profile)
+    narrowed = apply_constraint(pool, constraint)
+    pool = narrowed if len(narrowed) else pool
 
     seed = _lower(profile.get("user_id") or "user") + f":regen:{meal_type}:{_lower(constraint)}"
-    chosen = _seeded_choice(pool, seed) if pool else {}
+    chosen = _seeded_choice(pool, seed) if len(pool) else {}
     ok, reasons = diet_compliance_check(chosen, profile) if chosen else (False, ["no meal available"])
 
     return {
@@ -425,11 +1095,12 @@ def swap_meal(payload: Dict) -> Dict:
     else:
         meal_type = "dinner"; label = "Dinner"
 
-    pool = filter_meals_for_profile([m for m in MEAL_DB if m["meal_type"] == meal_type], profile)
-    pool = apply_constraint(pool, constraint) or pool
+    pool = candidate_pool(meal_type, profile)
+    narrowed = apply_constraint(pool, constraint)
+    pool = narrowed if len(narrowed) else pool
 
     seed = _lower(profile.get("user_id") or "user") + f":swap:{meal_type}:{_lower(constraint)}"
-    chosen = _seeded_choice(pool, seed) if pool else {}
+    chosen = _seeded_choice(pool, seed) if len(pool) else {}
 
     return {
         "meal": label,
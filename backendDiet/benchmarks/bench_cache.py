@@ -0,0 +1,77 @@
+# backend/benchmarks/bench_cache.py
+"""
+Multithreaded cache throughput: single lock (CACHE_SHARDS=1) vs sharded.
+
+Run from backendDiet/:
+    python benchmarks/bench_cache.py --threads 1,2,4,8 --shards 16
+
+Each worker does a 90/10 get/set mix over a prefilled key space shaped like
+the Places keys used by stores.fetch_nearby_stores.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cache  # noqa: E402
+
+
+def _worker(keys, ops, seed, barrier):
+    rnd = random.Random(seed)
+    value = [{"place_id": "x", "name": "Store"}]
+    barrier.wait()
+    for _ in range(ops):
+        k = keys[rnd.randrange(len(keys))]
+        if rnd.random() < 0.9:
+            cache.get(k)
+        else:
+            cache.set(k, value, ttl_seconds=1800)
+
+
+def run(shards: int, threads: int, ops_per_thread: int, n_keys: int) -> float:
+    cache.configure(shards=shards)
+    cache.clear()
+    keys = [f"places:{40 + i * 1e-4:.4f}:{-74 - i * 1e-4:.4f}:5000" for i in range(n_keys)]
+    for k in keys:
+        cache.set(k, [], ttl_seconds=1800)
+
+    barrier = threading.Barrier(threads + 1)
+    workers = [
+        threading.Thread(target=_worker, args=(keys, ops_per_thread, i, barrier))
+        for i in range(threads)
+    ]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops_per_thread / elapsed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--threads", default="1,2,4,8")
+    ap.add_argument("--shards", type=int, default=16)
+    ap.add_argument("--ops", type=int, default=100_000, help="operations per thread")
+    ap.add_argument("--keys", type=int, default=50_000)
+    args = ap.parse_args()
+
+    thread_counts = [int(t) for t in args.threads.split(",")]
+    print(f"{'threads':>7} | {'1 shard ops/s':>14} | {args.shards:>3} shards ops/s | speedup")
+    for t in thread_counts:
+        single = run(1, t, args.ops, args.keys)
+        sharded = run(args.shards, t, args.ops, args.keys)
+        print(f"{t:>7} | {single:>14,.0f} | {sharded:>16,.0f} | {sharded / single:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# backend/benchmarks/bench_constraints.py
+"""
+apply_constraint on ID pools: full stable argsort (the previous ranking)
+vs partial selection, for single and composite constraints.
+
+Run from backendDiet/:
+    python benchmarks/bench_constraints.py --meals 100000 --sizes 1000,10000,30000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ai  # noqa: E402
+from catalog import MealCatalog  # noqa: E402
+
+
+def _catalog(n: int, seed: int) -> MealCatalog:
+    rnd = random.Random(seed)
+    return MealCatalog.from_meals(
+        {
+            "meal_type": rnd.choice(("breakfast", "lunch", "dinner")),
+            "name": f"Meal {i}",
+            "calories": rnd.randint(200, 900),
+            "protein": rnd.randint(1, 60),
+            "fiber": rnd.randint(0, 20),
+            "sodium_mg": rnd.randint(0, 1500),
+            "cost_estimate": round(rnd.uniform(2.0, 12.0), 2),
+            "ingredients": [],
+            "allergens": [],
+        }
+        for i in range(n)
+    )
+
+
+def full_sort(pool: np.ndarray, constraint: str) -> np.ndarray:
+    col, descending = ai._CONSTRAINT_SORTS[constraint]
+    values = ai._pool_column(pool, col)
+    order = np.argsort(-values if descending else values, kind="stable")
+    return pool[order[: max(1, len(pool) // 2)]]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--meals", type=int, default=100_000)
+    ap.add_argument("--sizes", default="1000,10000,30000")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    ai.set_meal_catalog(_catalog(args.meals, 1))
+    rnd = np.random.default_rng(2)
+    r = args.repeat
+    us = 1e6 / r
+
+    print(f"{'constraint':<28} | {'pool':>6} | {'argsort us':>11} | {'select us':>10}")
+    for size in (int(x) for x in args.sizes.split(",")):
+        pool = rnd.choice(args.meals, size=min(size, args.meals), replace=False).astype(np.int32)
+        for c in ("cheaper", "higher_protein"):
+            assert (full_sort(pool, c) == ai.apply_constraint(pool, c)).all()
+            t_full = timeit.timeit(lambda: full_sort(pool, c), number=r)
+            t_sel = timeit.timeit(lambda: ai.apply_constraint(pool, c), number=r)
+            print(f"{c:<28} | {size:>6} | {t_full * us:>11.1f} | {t_sel * us:>10.1f}")
+        c = "higher_protein and cheaper"
+        t_sel = timeit.timeit(lambda: ai.apply_constraint(pool, c), number=r)
+        print(f"{c:<28} | {size:>6} | {'-':>11} | {t_sel * us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# backend/benchmarks/bench_http_client.py
+"""
+Outbound HTTP: bare requests.get vs the pooled http_client (sync and async),
+against a local stand-in for the Places Nearby Search endpoint.
+
+Run from backendDiet/:
+    python benchmarks/bench_http_client.py --requests 400 --concurrency 16 --delay-ms 20
+
+The server counts accepted TCP connections, so the keep-alive effect shows
+up directly next to throughput.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import http_client  # noqa: E402
+
+_BODY = json.dumps({
+    "status": "OK",
+    "results": [
+        {
+            "place_id": f"p{i}",
+            "name": f"Store {i}",
+            "geometry": {"location": {"lat": 40.7 + i * 1e-3, "lng": -74.0 - i * 1e-3}},
+            "price_level": i % 5,
+        }
+        for i in range(20)
+    ],
+}).encode()
+
+
+class _PlacesStandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    # Headers and body leave in one send (flushed after each request), with
+    # TCP_NODELAY, so keep-alive connections don't hit Nagle/delayed-ACK stalls
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    delay_s = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        with _PlacesStandIn.lock:
+            _PlacesStandIn.connections += 1
+        super().setup()
+
+    def do_GET(self):
+        time.sleep(self.delay_s)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_BODY)))
+        self.end_headers()
+        self.wfile.write(_BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def _run_threads(fn, url, n, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: fn(url), range(n)))
+
+
+def _bare(url):
+    r = requests.get(url, params={"location": "40.7,-74.0"}, timeout=10)
+    r.raise_for_status()
+    r.json()
+
+
+def _pooled(url):
+    r = http_client.get(url, params={"location": "40.7,-74.0"})
+    r.raise_for_status()
+    r.json()
+
+
+async def _async_all(url, n, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            r = await http_client.aget(url, params={"location": "40.7,-74.0"})
+            r.raise_for_status()
+
+    await asyncio.gather(*(one() for _ in range(n)))
+    await http_client.aclose()
+
+
+def _measure(label, run, n):
+    _PlacesStandIn.connections = 0
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} | {n / elapsed:>9.0f} | {_PlacesStandIn.connections:>11}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--delay-ms", type=float, default=20.0, help="simulated upstream latency")
+    args = ap.parse_args()
+
+    _PlacesStandIn.delay_s = args.delay_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PlacesStandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/maps/api/place/nearbysearch/json"
+
+    n, c = args.requests, args.concurrency
+    print(f"httpx: {http_client._HAS_HTTPX}")
+    print(f"{'client':<28} | {'req/s':>9} | connections")
+    _measure(f"requests.get x{c} threads", lambda: _run_threads(_bare, url, n, c), n)
+    _measure(f"http_client.get x{c} threads", lambda: _run_threads(_pooled, url, n, c), n)
+    _measure(f"http_client.aget ({c} tasks)", lambda: asyncio.run(_async_all(url, n, c)), n)
+
+    http_client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# backend/benchmarks/bench_maps_batch.py
+"""
+Batch maps kernels vs per-pair scalar calls: many-to-many distance matrix,
+element-wise midpoints and the bounding-box prefilter mask.
+
+Run from backendDiet/:
+    python benchmarks/bench_maps_batch.py --sizes 10,100,1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import maps  # noqa: E402
+
+
+def _points(n: int, seed: int):
+    rnd = random.Random(seed)
+    return [rnd.uniform(40.0, 41.0) for _ in range(n)], [rnd.uniform(-75.0, -73.0) for _ in range(n)]
+
+
+def scalar_matrix(lats, lngs):
+    return [[maps.distance_km(a, b, c, d) for c, d in zip(lats, lngs)] for a, b in zip(lats, lngs)]
+
+
+def scalar_midpoints(lats1, lngs1, lats2, lngs2):
+    return [maps.midpoint(a, b, c, d) for a, b, c, d in zip(lats1, lngs1, lats2, lngs2)]
+
+
+def scalar_mask(lat, lng, radius_km, lats, lngs):
+    min_lat, max_lat, min_lng, max_lng = maps.bounding_box(lat, lng, radius_km)
+    return [min_lat <= a <= max_lat and min_lng <= b <= max_lng for a, b in zip(lats, lngs)]
+
+
+def _row(label, n, t_scalar, t_batch, repeat):
+    us = 1e6 / repeat
+    print(f"{label:<10} | {n:>6} | {t_scalar * us:>12.1f} | {t_batch * us:>12.1f} | {t_scalar / t_batch:>7.1f}x")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10,100,1000")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"{'kernel':<10} | {'n':>6} | {'scalar us':>12} | {'batch us':>12} | speedup")
+    for n in (int(x) for x in args.sizes.split(",")):
+        lats, lngs = _points(n, 1)
+        lats2, lngs2 = _points(n, 2)
+        r = args.repeat
+
+        # n x n matrix
+        t_s = timeit.timeit(lambda: scalar_matrix(lats, lngs), number=r)
+        t_b = timeit.timeit(lambda: maps.distance_matrix(lats, lngs), number=r)
+        _row("matrix", n, t_s, t_b, r)
+
+        # Midpoints and masks are O(n): repeat more so timings are stable
+        r = args.repeat * 100
+        t_s = timeit.timeit(lambda: scalar_midpoints(lats, lngs, lats2, lngs2), number=r)
+        t_b = timeit.timeit(lambda: maps.midpoint_batch(lats, lngs, lats2, lngs2), number=r)
+        _row("midpoint", n, t_s, t_b, r)
+
+        t_s = timeit.timeit(lambda: scalar_mask(40.5, -74.0, 20.0, lats, lngs), number=r)
+        t_b = timeit.timeit(lambda: maps.bounding_box_mask(40.5, -74.0, 20.0, lats, lngs), number=r)
+        _row("bbox mask", n, t_s, t_b, r)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# backend/benchmarks/bench_optimizer.py
+"""
+optimize_day on a synthetic catalog: latency per slot shortlist size and
+macro deviation vs the default seeded day.
+
+Run from backendDiet/:
+    python benchmarks/bench_optimizer.py --meals 100000 --candidates 64,256,512
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ai  # noqa: E402
+from catalog import MealCatalog  # noqa: E402
+
+PROFILE = {"age": 30, "gender": "male", "weight_kg": 80, "height_cm": 180, "goal": "maintain", "budget": "medium"}
+
+
+def _catalog(n: int, seed: int) -> MealCatalog:
+    rnd = random.Random(seed)
+    return MealCatalog.from_meals(
+        {
+            "meal_type": rnd.choice(("breakfast", "lunch", "dinner")),
+            "name": f"Meal {i}",
+            "calories": rnd.randint(200, 1000),
+            "protein": rnd.randint(1, 70),
+            "carbs": rnd.randint(5, 120),
+            "fat": rnd.randint(2, 50),
+            "cost_estimate": round(rnd.uniform(2.0, 12.0), 2),
+            "ingredients": [],
+            "allergens": [],
+        }
+        for i in range(n)
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--meals", type=int, default=100_000)
+    ap.add_argument("--candidates", default="64,256,512")
+    ap.add_argument("--users", type=int, default=10)
+    args = ap.parse_args()
+
+    ai.set_meal_catalog(_catalog(args.meals, 1))
+    targets = ai.macro_targets(PROFILE)
+    profiles = [{**PROFILE, "user_id": f"user{i}"} for i in range(args.users)]
+    pools = tuple(ai.candidate_pool(t, PROFILE, relax=True) for t in ("breakfast", "lunch", "dinner"))
+    print(f"slot pools: {[len(p) for p in pools]}")
+
+    seeded = [
+        ai.day_deviation(tuple(int(random.Random(p["user_id"] + s).choice(q)) for s, q in zip((":b", ":l", ":d"), pools)), targets)
+        for p in profiles
+    ]
+    print(f"{'candidates':>10} | {'ms/day':>8} | {'deviation':>9} | {'seeded':>9}")
+    for k in (int(x) for x in args.candidates.split(",")):
+        ai.OPTIMIZER_SLOT_CANDIDATES = k
+        start = time.perf_counter()
+        days = [ai.optimize_day(p, p["user_id"], pools) for p in profiles]
+        ms = (time.perf_counter() - start) * 1e3 / len(profiles)
+        dev = sum(ai.day_deviation(d, targets) for d in days) / len(days)
+        print(f"{k:>10} | {ms:>8.1f} | {dev:>9.4f} | {sum(seeded) / len(seeded):>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
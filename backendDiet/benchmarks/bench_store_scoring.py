@@ -0,0 +1,82 @@
+# backend/benchmarks/bench_store_scoring.py
+"""
+Store scoring: per-store scalar loop vs batch (NumPy) kernels.
+
+Run from backendDiet/:
+    python benchmarks/bench_store_scoring.py --sizes 20,200,2000
+
+Times only distance + score computation, the part find_stores vectorizes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import maps  # noqa: E402
+import stores  # noqa: E402
+
+
+def _fake_places(n: int, lat: float, lng: float, seed: int = 7):
+    rnd = random.Random(seed)
+    return [
+        {
+            "place_id": f"p{i}",
+            "geometry": {"location": {"lat": lat + rnd.uniform(-0.05, 0.05), "lng": lng + rnd.uniform(-0.05, 0.05)}},
+            "price_level": rnd.randint(0, 4),
+        }
+        for i in range(n)
+    ]
+
+
+def scalar(places, lat, lng, coverage, budget):
+    out = []
+    for s in places:
+        loc = s["geometry"]["location"]
+        d = maps.distance_km(lat, lng, loc["lat"], loc["lng"])
+        p = s["price_level"]
+        out.append(stores.compute_store_score(d, coverage, p, stores._budget_match(budget, p)))
+    return out
+
+
+def batch(places, lat, lng, coverage, budget):
+    prices = [s["price_level"] for s in places]
+    dists = maps.distance_km_batch(
+        lat,
+        lng,
+        [s["geometry"]["location"]["lat"] for s in places],
+        [s["geometry"]["location"]["lng"] for s in places],
+    )
+    return stores.compute_store_scores(
+        dists,
+        [coverage] * len(places),
+        prices,
+        [stores._budget_match(budget, p) for p in prices],
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="20,200,2000")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    lat, lng, coverage, budget = 40.7128, -74.0060, 80.0, "medium"
+    print(f"{'stores':>7} | {'scalar us':>10} | {'batch us':>10} | speedup")
+    for n in (int(x) for x in args.sizes.split(",")):
+        places = _fake_places(n, lat, lng)
+        assert list(scalar(places, lat, lng, coverage, budget)) == [float(x) for x in batch(places, lat, lng, coverage, budget)]
+
+        t_scalar = timeit.timeit(lambda: scalar(places, lat, lng, coverage, budget), number=args.repeat)
+        t_batch = timeit.timeit(lambda: batch(places, lat, lng, coverage, budget), number=args.repeat)
+        us = 1e6 / args.repeat
+        print(f"{n:>7} | {t_scalar * us:>10.1f} | {t_batch * us:>10.1f} | {t_scalar / t_batch:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
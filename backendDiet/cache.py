@@ -1,72 +1,975 @@
 # backend/cache.py
 from __future__ import annotations
 
+import asyncio
+import heapq
+import json
+import os
+import queue
+import sqlite3
 import time
 import threading
-from typing import Any, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from logging_config import logger
 
 
 # -----------------------------
 # Simple thread-safe in-memory cache
 # -----------------------------
+# Sharding: keys are spread over CACHE_SHARDS independently locked segments
+# (picked by key hash), so request threads only contend when they touch the
+# same segment. CACHE_SHARDS=1 gives the original single-lock behavior.
+#
+# Bounded mode: when CACHE_MAX_ENTRIES and/or CACHE_MAX_BYTES are set
+# (env or configure()), least-recently-used entries are evicted once a
+# limit is exceeded. 0 means "no limit" (the original unbounded behavior).
+# Limits are split evenly across segments and LRU order is per segment.
+# CACHE_MAX_BYTES defaults to 256 MiB: Places entries are kept for hours for
+# stale-if-error, so an unbounded L1 would grow with every area searched.
+#
+# Expiry: every set() pushes (expires_at, key) onto a min-heap, so expired
+# entries are reclaimed from the heap top in amortized O(log n) each instead
+# of scanning the whole dict. Overwritten keys leave stale heap records behind;
+# they are skipped on pop and the heap is rebuilt when it grows too large.
+# An optional sweeper thread (start_sweeper / CACHE_SWEEP_SECONDS) reclaims
+# expired entries in the background in small batches.
+#
+# Persistent L2 (optional): entries written with set(..., persist=True) are
+# also queued to a SQLite file by a write-behind thread, together with their
+# expires_at. An L1 miss reads through to SQLite and promotes live rows back
+# into memory. Nothing is loaded at startup, so boot time is independent of
+# how much is on disk. Enable with CACHE_L2_PATH or enable_l2().
+# delete() and clear() queue their L2 ops too; until the writer commits them,
+# a tombstone makes L2 reads of the affected keys miss.
+#
+# Single-flight: get_or_load() lets exactly one thread run the loader for a
+# missing key; concurrent callers for the same key wait for that result.
+# Loader errors are re-raised in every waiter and nothing is cached.
+#
+# Stale serving: get_or_load(..., stale_ttl_seconds, stale_if_error_seconds)
+# gives an entry three windows. Until the soft TTL (ttl_seconds) it is fresh.
+# Until the hard TTL (+stale_ttl_seconds) it is returned immediately while a
+# background refresh runs. Past that it is kept for stale_if_error_seconds
+# more and only returned if the synchronous reload fails. Plain get()
+# treats everything up to the hard TTL as a hit.
+#
+# Async: get_or_load_async() is the coroutine twin of get_or_load() for
+# native async endpoints; it coalesces on asyncio futures instead of
+# blocking threads (one event loop per worker process is assumed).
 
-_CACHE: dict[str, tuple[Any, float]] = {}
-_LOCK = threading.Lock()
+CACHE_SHARDS = max(1, int(os.getenv("CACHE_SHARDS", "16")))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "0"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_SWEEP_SECONDS = float(os.getenv("CACHE_SWEEP_SECONDS", "0"))
 
+SWEEP_BATCH = 512  # max entries reclaimed per lock acquisition by the sweeper
 
-def get(key: str) -> Optional[Any]:
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_L2_PATH = BASE_DIR / "cache_l2.db"  # next to diet_app.db
+CACHE_L2_PATH = os.getenv("CACHE_L2_PATH", "")
+
+L2_BATCH = 256               # max queued writes applied per transaction
+L2_QUEUE_MAX = 10_000        # pending writes beyond this are dropped (L2 is best-effort)
+L2_PURGE_SECONDS = 300       # how often the writer deletes expired rows
+
+REFRESH_WORKERS = 4          # threads running stale-while-revalidate refreshes
+
+
+# -----------------------------
+# Segment
+# -----------------------------
+
+class _Segment:
     """
-    Get a cached value if present and not expired.
+    One independently locked slice of the cache.
+    All underscore methods expect self.lock to be held.
     """
-    now = time.time()
 
-    with _LOCK:
-        item = _CACHE.get(key)
-        if not item:
+    __slots__ = ("lock", "entries", "expiry_heap", "bytes", "max_entries", "max_bytes", "stats", "generation")
+
+    def __init__(self, max_entries: int = 0, max_bytes: int = 0):
+        self.lock = threading.Lock()
+        # key -> (value, expires_at, approx_bytes, fresh_until, hard_until);
+        # ordered oldest -> most recently used. expires_at is when the entry is
+        # dropped; it is >= hard_until >= fresh_until.
+        self.entries: "OrderedDict[str, tuple[Any, float, int, float, float]]" = OrderedDict()
+        self.expiry_heap: List[tuple[float, str]] = []
+        self.bytes = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Bumped by every set/delete/clear: an L2 row read before a bump is
+        # outdated and must not be promoted into L1
+        self.generation = 0
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "expirations": 0,
+            "evictions_entries": 0,  # evicted because of CACHE_MAX_ENTRIES
+            "evictions_bytes": 0,    # evicted because of CACHE_MAX_BYTES
+        }
+
+    def _remove(self, key: str) -> None:
+        item = self.entries.pop(key, None)
+        if item is not None:
+            self.bytes -= item[2]
+
+    def _purge_expired(self, now: float, limit: Optional[int] = None) -> int:
+        """
+        Pop expired entries off the expiry heap. Returns how many were removed.
+        """
+        removed = 0
+        heap = self.expiry_heap
+        while heap and heap[0][0] < now:
+            if limit is not None and removed >= limit:
+                break
+            expires_at, key = heapq.heappop(heap)
+            item = self.entries.get(key)
+            if item is None or item[1] != expires_at:
+                continue  # stale heap record (key deleted or overwritten)
+            self._remove(key)
+            self.stats["expirations"] += 1
+            removed += 1
+        return removed
+
+    def _push_expiry(self, key: str, expires_at: float) -> None:
+        heapq.heappush(self.expiry_heap, (expires_at, key))
+        if len(self.expiry_heap) > 2 * len(self.entries) + 64:
+            # Too many stale records from overwrites/deletes: rebuild from live entries
+            self.expiry_heap = [(item[1], k) for k, item in self.entries.items()]
+            heapq.heapify(self.expiry_heap)
+
+    def _over_limit(self) -> bool:
+        return bool(
+            (self.max_entries and len(self.entries) > self.max_entries)
+            or (self.max_bytes and self.bytes > self.max_bytes)
+        )
+
+    def _evict(self, now: float) -> None:
+        """
+        Evict LRU entries until both limits are satisfied.
+        Expired entries go first and are counted as expirations, not evictions.
+        """
+        if self._over_limit():
+            self._purge_expired(now)
+
+        while self.entries and self._over_limit():
+            over_entries = self.max_entries and len(self.entries) > self.max_entries
+            key, item = next(iter(self.entries.items()))
+            self._remove(key)
+            if item[1] < now:
+                self.stats["expirations"] += 1
+            elif over_entries:
+                self.stats["evictions_entries"] += 1
+            else:
+                self.stats["evictions_bytes"] += 1
+
+    def _put(
+        self,
+        key: str,
+        value: Any,
+        expires_at: float,
+        nbytes: int,
+        now: float,
+        fresh_until: Optional[float] = None,
+        hard_until: Optional[float] = None,
+    ) -> None:
+        self._remove(key)
+        if self.max_bytes and nbytes > self.max_bytes:
+            # Larger than the whole budget: caching it would flush everything else
+            self.stats["evictions_bytes"] += 1
+            return
+
+        hard = expires_at if hard_until is None else hard_until
+        fresh = hard if fresh_until is None else fresh_until
+        self.entries[key] = (value, expires_at, nbytes, fresh, hard)
+        self.bytes += nbytes
+        self._push_expiry(key, expires_at)
+        self._evict(now)
+
+
+def _split_limit(total: int, shards: int) -> int:
+    # Round up so the per-segment limits never add up to less than the total
+    return -(-total // shards) if total else 0
+
+
+def _build_segments(shards: int) -> List[_Segment]:
+    return [
+        _Segment(_split_limit(CACHE_MAX_ENTRIES, shards), _split_limit(CACHE_MAX_BYTES, shards))
+        for _ in range(shards)
+    ]
+
+
+_SEGMENTS: List[_Segment] = _build_segments(CACHE_SHARDS)
+
+# Guards reconfiguration and the sweeper thread; never taken on the get/set path
+_ADMIN_LOCK = threading.Lock()
+
+_SWEEPER: Optional[threading.Thread] = None
+_SWEEPER_STOP = threading.Event()
+
+_L2_PATH: Optional[Path] = Path(CACHE_L2_PATH) if CACHE_L2_PATH else None
+_L2_LOCAL = threading.local()  # per-thread read connection
+_L2_QUEUE: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=L2_QUEUE_MAX)
+_L2_WRITER: Optional[threading.Thread] = None
+_L2_TOMBSTONE_LOCK = threading.Lock()
+_L2_PENDING_DELETES: Dict[str, int] = {}  # key -> queued deletes not yet committed
+_L2_PENDING_CLEARS = 0                     # queued clears not yet committed
+_COUNTERS_LOCK = threading.Lock()
+_COUNTERS: Dict[str, int] = {
+    "l2_hits": 0,
+    "l2_misses": 0,
+    "l2_writes": 0,
+    "l2_dropped": 0,
+    "stale_served": 0,        # returned between soft and hard TTL
+    "stale_on_error": 0,      # returned past hard TTL because the loader failed
+    "background_refreshes": 0,
+}
+
+
+# -----------------------------
+# Internal helpers
+# -----------------------------
+
+def _segment(key: str) -> _Segment:
+    segments = _SEGMENTS
+    return segments[hash(key) % len(segments)]
+
+
+def _encode(value: Any) -> Optional[str]:
+    # Compact JSON body (the L2 row format), or None if value isn't JSON
+    try:
+        return json.dumps(value, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _approx_size(key: str, value: Any, body: Optional[str] = None) -> int:
+    """
+    Approximate footprint of an entry, measured as its compact JSON length.
+    Only computed when a byte budget is configured; pass the body when the
+    caller has already encoded the value.
+    """
+    if not CACHE_MAX_BYTES:
+        return 0
+    if body is None:
+        try:
+            body = json.dumps(value, separators=(",", ":"), default=str)
+        except (TypeError, ValueError):
+            body = repr(value)
+    return len(key) + len(body)
+
+
+# -----------------------------
+# Persistent L2 tier (SQLite)
+# -----------------------------
+
+def _l2_connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        key TEXT PRIMARY KEY,
+        value_json TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        fresh_until REAL,
+        hard_until REAL
+    )
+    """)
+    # Files written before soft/hard TTLs existed: NULL means "same as expires_at"
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")}
+    for col in ("fresh_until", "hard_until"):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE cache_entries ADD COLUMN {col} REAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries(expires_at)")
+    conn.commit()
+    return conn
+
+
+def _l2_reader() -> Optional[sqlite3.Connection]:
+    path = _L2_PATH
+    if path is None:
+        return None
+    if getattr(_L2_LOCAL, "path", None) != path:
+        _L2_LOCAL.conn = _l2_connect(path)
+        _L2_LOCAL.path = path
+    return _L2_LOCAL.conn
+
+
+def _count(name: str) -> None:
+    with _COUNTERS_LOCK:
+        _COUNTERS[name] += 1
+
+
+def _l2_tombstone(op: tuple, delta: int) -> None:
+    global _L2_PENDING_CLEARS
+    with _L2_TOMBSTONE_LOCK:
+        if op[0] == "clear":
+            _L2_PENDING_CLEARS += delta
+            return
+        n = _L2_PENDING_DELETES.get(op[1], 0) + delta
+        if n > 0:
+            _L2_PENDING_DELETES[op[1]] = n
+        else:
+            _L2_PENDING_DELETES.pop(op[1], None)
+
+
+def _l2_get(key: str, now: float) -> Optional[tuple[Any, float, float, float]]:
+    """
+    Returns (value, expires_at, fresh_until, hard_until) for a live row.
+    """
+    with _L2_TOMBSTONE_LOCK:
+        if _L2_PENDING_CLEARS or key in _L2_PENDING_DELETES:
+            _count("l2_misses")
+            return None
+    try:
+        conn = _l2_reader()
+        if conn is None:
             return None
+        row = conn.execute(
+            "SELECT value_json, expires_at, fresh_until, hard_until FROM cache_entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"cache L2 read failed: {e}")
+        return None
+
+    if not row or row[1] < now:
+        _count("l2_misses")
+        return None
+    _count("l2_hits")
+    expires_at = row[1]
+    hard_until = expires_at if row[3] is None else row[3]
+    fresh_until = hard_until if row[2] is None else row[2]
+    return json.loads(row[0]), expires_at, fresh_until, hard_until
+
+
+def _l2_writer_loop(path: Path) -> None:
+    conn = _l2_connect(path)
+    last_purge = time.time()
+    running = True
 
-        value, expires_at = item
-        if expires_at < now:
+    while running:
+        batch = [_L2_QUEUE.get()]
+        while len(batch) < L2_BATCH:
+            try:
+                batch.append(_L2_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            for op in batch:
+                if op is None:
+                    running = False
+                elif op[0] == "set":
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cache_entries "
+                        "(key, value_json, expires_at, fresh_until, hard_until) VALUES (?, ?, ?, ?, ?)",
+                        op[1:],
+                    )
+                elif op[0] == "delete":
+                    conn.execute("DELETE FROM cache_entries WHERE key = ?", (op[1],))
+                elif op[0] == "clear":
+                    conn.execute("DELETE FROM cache_entries")
+
+            now = time.time()
+            if now - last_purge > L2_PURGE_SECONDS:
+                conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+                last_purge = now
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"cache L2 write failed: {e}")
+            conn.rollback()
+        finally:
+            for op in batch:
+                if op is not None and op[0] in ("delete", "clear"):
+                    _l2_tombstone(op, -1)
+                _L2_QUEUE.task_done()
+
+    conn.close()
+
+
+def _l2_enqueue(op: tuple) -> None:
+    global _L2_WRITER
+    if _L2_PATH is None:
+        return
+
+    if _L2_WRITER is None or not _L2_WRITER.is_alive():
+        with _ADMIN_LOCK:
+            if _L2_WRITER is None or not _L2_WRITER.is_alive():
+                _L2_WRITER = threading.Thread(
+                    target=_l2_writer_loop,
+                    args=(_L2_PATH,),
+                    name="cache-l2-writer",
+                    daemon=True,
+                )
+                _L2_WRITER.start()
+
+    if op[0] != "set":
+        # Deletes are never dropped: the tombstone stays until the writer
+        # commits them (waits only while the queue is full)
+        _l2_tombstone(op, 1)
+        _L2_QUEUE.put(op)
+        return
+    try:
+        _L2_QUEUE.put_nowait(op)
+    except queue.Full:
+        _count("l2_dropped")
+        return
+    _count("l2_writes")
+
+
+def flush_l2() -> None:
+    """
+    Block until every queued L2 write has been committed.
+    """
+    if _L2_WRITER is not None and _L2_WRITER.is_alive():
+        _L2_QUEUE.join()
+
+
+def enable_l2(path: Optional[str] = None) -> None:
+    """
+    Turn on the SQLite L2 tier (default file: cache_l2.db next to diet_app.db).
+    The file is opened lazily on first read or write.
+    """
+    global _L2_PATH
+    disable_l2()
+    _L2_PATH = Path(path) if path else DEFAULT_L2_PATH
+
+
+def disable_l2() -> None:
+    """
+    Flush pending writes, stop the writer thread and detach the L2 tier.
+    The SQLite file is kept.
+    """
+    global _L2_PATH, _L2_WRITER
+    with _ADMIN_LOCK:
+        writer = _L2_WRITER
+        if writer is not None and writer.is_alive():
+            _L2_QUEUE.put(None)
+            writer.join()
+        _L2_WRITER = None
+        _L2_PATH = None
+
+
+# -----------------------------
+# Public API
+# -----------------------------
+
+def _l1_lookup(key: str, now: float) -> Optional[tuple[Any, float, float]]:
+    seg = _segment(key)
+    with seg.lock:
+        item = seg.entries.get(key)
+        if item:
+            value, expires_at, _, fresh_until, hard_until = item
+            if expires_at >= now:
+                seg.entries.move_to_end(key)
+                seg.stats["hits" if hard_until >= now else "misses"] += 1
+                return value, fresh_until, hard_until
             # Expired — remove
-            _CACHE.pop(key, None)
-            return None
+            seg._remove(key)
+            seg.stats["expirations"] += 1
+        seg.stats["misses"] += 1
+    return None
+
+
+def _promote(
+    key: str,
+    now: float,
+    found: tuple[Any, float, float, float],
+    generation: int,
+) -> tuple[Any, float, float]:
+    # Copy a live L2 row back into L1, unless a set/delete/clear landed since
+    # the row was read (generation moved on) or L1 was filled meanwhile
+    value, expires_at, fresh_until, hard_until = found
+    nbytes = _approx_size(key, value)
+    seg = _segment(key)
+    with seg.lock:
+        if seg.generation == generation and key not in seg.entries:
+            seg._put(key, value, expires_at, nbytes, now, fresh_until, hard_until)
+    return value, fresh_until, hard_until
+
+
+def _lookup(key: str, now: float) -> Optional[tuple[Any, float, float]]:
+    """
+    Find key in L1, then L2. Entries past their hard TTL but still retained
+    for stale-if-error are returned too; callers compare the TTLs.
+    Returns (value, fresh_until, hard_until).
+    """
+    generation = _segment(key).generation
+    found = _l1_lookup(key, now)
+    if found is not None or _L2_PATH is None:
+        return found
+
+    # Read-through (outside the segment lock: this is disk I/O)
+    row = _l2_get(key, now)
+    return None if row is None else _promote(key, now, row, generation)
+
 
-        return value
+async def _lookup_async(key: str, now: float) -> Optional[tuple[Any, float, float]]:
+    """
+    _lookup() for coroutines: the SQLite read runs in a worker thread so it
+    never blocks the event loop.
+    """
+    generation = _segment(key).generation
+    found = _l1_lookup(key, now)
+    if found is not None or _L2_PATH is None:
+        return found
+
+    row = await asyncio.to_thread(_l2_get, key, now)
+    return None if row is None else _promote(key, now, row, generation)
+
+
+def get(key: str) -> Optional[Any]:
+    """
+    Get a cached value if present and not expired (past its hard TTL).
+    """
+    now = time.time()
+    found = _lookup(key, now)
+    if found is None or found[2] < now:
+        return None
+    return found[0]
 
 
-def set(key: str, value: Any, ttl_seconds: int = 300) -> None:
+def set(
+    key: str,
+    value: Any,
+    ttl_seconds: int = 300,
+    persist: bool = False,
+    stale_ttl_seconds: int = 0,
+    stale_if_error_seconds: int = 0,
+) -> None:
     """
     Set a cached value with a TTL (seconds).
+    persist=True also writes it behind to the L2 tier when enabled
+    (value must be JSON-serializable). The stale_* windows extend the
+    entry's life past ttl_seconds for get_or_load(); see module notes.
     """
-    expires_at = time.time() + ttl_seconds
+    now = time.time()
+    fresh_until = now + ttl_seconds
+    hard_until = fresh_until + stale_ttl_seconds
+    expires_at = hard_until + stale_if_error_seconds
+    persist = persist and _L2_PATH is not None
+    # Encode once: the same body sizes the entry and goes to the L2 queue
+    body = _encode(value) if persist or CACHE_MAX_BYTES else None
+    nbytes = _approx_size(key, value, body)
+    seg = _segment(key)
+
+    with seg.lock:
+        seg.generation += 1
+        seg._put(key, value, expires_at, nbytes, now, fresh_until, hard_until)
 
-    with _LOCK:
-        _CACHE[key] = (value, expires_at)
+    if persist and body is not None:
+        _l2_enqueue(("set", key, body, expires_at, fresh_until, hard_until))
 
 
 def delete(key: str) -> None:
     """
-    Remove a cache entry manually.
+    Remove a cache entry manually (from both tiers).
     """
-    with _LOCK:
-        _CACHE.pop(key, None)
+    seg = _segment(key)
+    with seg.lock:
+        seg.generation += 1
+        seg._remove(key)
+    if _L2_PATH is not None:
+        _l2_enqueue(("delete", key))
 
 
 def clear() -> None:
     """
-    Clear entire cache (useful for tests).
+    Clear entire cache, including the L2 tier (useful for tests).
     """
-    with _LOCK:
-        _CACHE.clear()
+    for seg in _SEGMENTS:
+        with seg.lock:
+            seg.generation += 1
+            seg.entries.clear()
+            seg.expiry_heap.clear()
+            seg.bytes = 0
+    if _L2_PATH is not None:
+        _l2_enqueue(("clear",))
 
 
 def size() -> int:
     """
     Number of active (non-expired) cache entries.
+    Includes entries past their hard TTL that are only retained for
+    stale-if-error; stats() reports those as entries_stale_if_error.
+    Only entries that expired since the last reclaim are touched, so this
+    stays cheap enough for health checks.
+    """
+    now = time.time()
+    total = 0
+    for seg in _SEGMENTS:
+        with seg.lock:
+            seg._purge_expired(now)
+            total += len(seg.entries)
+    return total
+
+
+def sweep(limit: Optional[int] = None) -> int:
+    """
+    Reclaim expired entries now (up to `limit` per segment).
+    Returns the number removed.
+    """
+    now = time.time()
+    removed = 0
+    for seg in _SEGMENTS:
+        with seg.lock:
+            removed += seg._purge_expired(now, limit)
+    return removed
+
+
+def _sweep_loop(interval_seconds: float) -> None:
+    while not _SWEEPER_STOP.wait(interval_seconds):
+        # Small batches so request threads never wait behind a long sweep
+        while sweep(SWEEP_BATCH) >= SWEEP_BATCH:
+            pass
+
+
+def start_sweeper(interval_seconds: Optional[float] = None) -> None:
+    """
+    Start the background expiry sweeper (no-op if already running).
     """
+    global _SWEEPER
+    interval = interval_seconds or CACHE_SWEEP_SECONDS or 30.0
+
+    with _ADMIN_LOCK:
+        if _SWEEPER is not None and _SWEEPER.is_alive():
+            return
+        _SWEEPER_STOP.clear()
+        _SWEEPER = threading.Thread(
+            target=_sweep_loop,
+            args=(interval,),
+            name="cache-sweeper",
+            daemon=True,
+        )
+        _SWEEPER.start()
+
+
+def stop_sweeper() -> None:
+    """
+    Stop the background sweeper and wait for it to exit.
+    """
+    global _SWEEPER
+    with _ADMIN_LOCK:
+        _SWEEPER_STOP.set()
+        if _SWEEPER is not None:
+            _SWEEPER.join()
+            _SWEEPER = None
+
+
+def configure(
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    shards: Optional[int] = None,
+) -> None:
+    """
+    Change the cache bounds and/or shard count at runtime (0 disables a limit).
+    Shrinking the limits evicts immediately; changing the shard count
+    rehashes the live entries into fresh segments (meant for startup and
+    benchmarks: writes racing with a rehash may be dropped).
+    """
+    global CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_SHARDS, _SEGMENTS
+
+    with _ADMIN_LOCK:
+        was_tracking = bool(CACHE_MAX_BYTES)
+        if max_entries is not None:
+            CACHE_MAX_ENTRIES = max(0, int(max_entries))
+        if max_bytes is not None:
+            CACHE_MAX_BYTES = max(0, int(max_bytes))
+        if shards is not None:
+            CACHE_SHARDS = max(1, int(shards))
+        remeasure = bool(CACHE_MAX_BYTES) and not was_tracking
+
+        now = time.time()
+        old = _SEGMENTS
+        if len(old) != CACHE_SHARDS or remeasure:
+            # Sizes were not tracked while unbounded, or keys need rehashing:
+            # rebuild and reinsert in LRU order so recency is preserved per segment
+            live = []
+            for seg in old:
+                with seg.lock:
+                    live.extend((k, item) for k, item in seg.entries.items() if item[1] >= now)
+            new = _build_segments(CACHE_SHARDS)
+            for seg in old:
+                for name, count in seg.stats.items():
+                    new[0].stats[name] += count
+            # Promotes still in flight against the old segments must not land
+            generation = max(seg.generation for seg in old) + 1
+            for seg in new:
+                seg.generation = generation
+            for k, (v, exp, _, fresh, hard) in live:
+                seg = new[hash(k) % len(new)]
+                seg._put(k, v, exp, _approx_size(k, v), now, fresh, hard)
+            _SEGMENTS = new
+            return
+
+        per_entries = _split_limit(CACHE_MAX_ENTRIES, CACHE_SHARDS)
+        per_bytes = _split_limit(CACHE_MAX_BYTES, CACHE_SHARDS)
+        for seg in old:
+            with seg.lock:
+                seg.max_entries = per_entries
+                seg.max_bytes = per_bytes
+                seg._evict(now)
+
+
+def stats() -> Dict[str, int]:
+    """
+    Hit/miss/eviction counters plus current occupancy, summed over segments.
+    """
+    out: Dict[str, int] = {
+        "hits": 0,
+        "misses": 0,
+        "expirations": 0,
+        "evictions_entries": 0,
+        "evictions_bytes": 0,
+        "entries": 0,
+        "entries_stale_if_error": 0,  # past hard TTL, kept only as a fallback
+        "bytes": 0,
+    }
     now = time.time()
-    with _LOCK:
-        expired = [k for k, (_, exp) in _CACHE.items() if exp < now]
-        for k in expired:
-            _CACHE.pop(k, None)
-        return len(_CACHE)
+    for seg in _SEGMENTS:
+        with seg.lock:
+            for k, v in seg.stats.items():
+                out[k] += v
+            out["entries"] += len(seg.entries)
+            out["entries_stale_if_error"] += sum(1 for item in seg.entries.values() if item[4] < now <= item[1])
+            out["bytes"] += seg.bytes
+
+    with _COUNTERS_LOCK:
+        out.update(_COUNTERS)
+    out["l2_enabled"] = int(_L2_PATH is not None)
+    out["l2_pending"] = _L2_QUEUE.qsize()
+
+    out["shards"] = len(_SEGMENTS)
+    out["max_entries"] = CACHE_MAX_ENTRIES
+    out["max_bytes"] = CACHE_MAX_BYTES
+    return out
+
+
+# -----------------------------
+# Single-flight loading
+# -----------------------------
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_FLIGHTS: Dict[str, _Flight] = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+
+def single_flight(key: str, fn: Callable[[], Any]) -> Any:
+    """
+    Run fn() once per key at a time. Callers arriving while a call for the
+    same key is in flight block and receive its result (or its exception).
+    """
+    with _FLIGHTS_LOCK:
+        flight = _FLIGHTS.get(key)
+        leader = flight is None
+        if leader:
+            flight = _FLIGHTS[key] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        flight.value = fn()
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _FLIGHTS_LOCK:
+            _FLIGHTS.pop(key, None)
+        flight.done.set()
+    return flight.value
+
+
+_REFRESH_POOL: Optional[ThreadPoolExecutor] = None
+_REFRESHING: Dict[str, float] = {}  # key -> refresh start time (module `set` shadows the builtin)
+
+
+def _refresh_in_background(key: str, load: Callable[[], Any]) -> None:
+    global _REFRESH_POOL
+
+    with _FLIGHTS_LOCK:
+        if key in _REFRESHING or key in _FLIGHTS:
+            return  # a refresh or synchronous load is already running
+        _REFRESHING[key] = time.time()
+        if _REFRESH_POOL is None:
+            _REFRESH_POOL = ThreadPoolExecutor(
+                max_workers=REFRESH_WORKERS,
+                thread_name_prefix="cache-refresh",
+            )
+
+    def run() -> None:
+        try:
+            single_flight(key, load)
+        except Exception as e:
+            # The stale value keeps being served until the hard TTL
+            logger.warning(f"cache background refresh failed for {key}: {e}")
+        finally:
+            with _FLIGHTS_LOCK:
+                _REFRESHING.pop(key, None)
+
+    _count("background_refreshes")
+    _REFRESH_POOL.submit(run)
+
+
+def get_or_load(
+    key: str,
+    loader: Callable[[], Any],
+    ttl_seconds: int = 300,
+    persist: bool = False,
+    stale_ttl_seconds: int = 0,
+    stale_if_error_seconds: int = 0,
+) -> Any:
+    """
+    Return the cached value for key, or load it with single-flight
+    protection and cache the result. Failed loads are not cached.
+
+    With stale_ttl_seconds, a value past its soft TTL is returned at once
+    and refreshed in the background. With stale_if_error_seconds, a value
+    past its hard TTL is returned if the reload raises.
+    """
+    def _load_and_set() -> Any:
+        # A previous leader may have refreshed the key between our lookup
+        # and becoming leader ourselves
+        current = _lookup(key, time.time())
+        if current is not None and time.time() <= current[1]:
+            return current[0]
+        fresh = loader()
+        set(
+            key,
+            fresh,
+            ttl_seconds,
+            persist=persist,
+            stale_ttl_seconds=stale_ttl_seconds,
+            stale_if_error_seconds=stale_if_error_seconds,
+        )
+        return fresh
+
+    now = time.time()
+    found = _lookup(key, now)
+    if found is not None:
+        value, fresh_until, hard_until = found
+        if now <= fresh_until:
+            return value
+        if now <= hard_until:
+            _count("stale_served")
+            _refresh_in_background(key, _load_and_set)
+            return value
+
+    try:
+        return single_flight(key, _load_and_set)
+    except Exception as e:
+        if found is None:
+            raise
+        _count("stale_on_error")
+        logger.warning(f"cache serving stale value for {key} after load error: {e}")
+        return found[0]
+
+
+# -----------------------------
+# Async loading (coroutine callers)
+# -----------------------------
+
+_ASYNC_FLIGHTS: Dict[str, "asyncio.Future[Any]"] = {}
+_ASYNC_REFRESHING: Dict[str, "asyncio.Task[Any]"] = {}
+
+
+def _consume_exception(fut: "asyncio.Future[Any]") -> None:
+    # Avoid "exception was never retrieved" when nobody else was waiting
+    if not fut.cancelled():
+        fut.exception()
+
+
+async def single_flight_async(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Await fn() once per key at a time; concurrent awaiters share its result
+    (or its exception). The load runs in its own task and every caller,
+    the first included, awaits it through a shield, so a cancelled caller
+    (e.g. a disconnected client) never cancels the load for the others.
+    """
+    task = _ASYNC_FLIGHTS.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fn())
+        _ASYNC_FLIGHTS[key] = task
+
+        def _done(t: "asyncio.Future[Any]") -> None:
+            if _ASYNC_FLIGHTS.get(key) is t:
+                del _ASYNC_FLIGHTS[key]
+            _consume_exception(t)
+
+        task.add_done_callback(_done)
+    return await asyncio.shield(task)
+
+
+async def get_or_load_async(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl_seconds: int = 300,
+    persist: bool = False,
+    stale_ttl_seconds: int = 0,
+    stale_if_error_seconds: int = 0,
+) -> Any:
+    """
+    Coroutine version of get_or_load(): same TTL windows, single-flight per
+    key, background refresh as an asyncio task.
+    """
+    async def _load_and_set() -> Any:
+        current = await _lookup_async(key, time.time())
+        if current is not None and time.time() <= current[1]:
+            return current[0]
+        fresh = await loader()
+        set(
+            key,
+            fresh,
+            ttl_seconds,
+            persist=persist,
+            stale_ttl_seconds=stale_ttl_seconds,
+            stale_if_error_seconds=stale_if_error_seconds,
+        )
+        return fresh
+
+    async def _refresh() -> None:
+        try:
+            await single_flight_async(key, _load_and_set)
+        except Exception as e:
+            logger.warning(f"cache background refresh failed for {key}: {e}")
+        finally:
+            _ASYNC_REFRESHING.pop(key, None)
+
+    now = time.time()
+    found = await _lookup_async(key, now)
+    if found is not None:
+        value, fresh_until, hard_until = found
+        if now <= fresh_until:
+            return value
+        if now <= hard_until:
+            _count("stale_served")
+            if key not in _ASYNC_REFRESHING and key not in _ASYNC_FLIGHTS:
+                _count("background_refreshes")
+                _ASYNC_REFRESHING[key] = asyncio.create_task(_refresh())
+            return value
+
+    try:
+        return await single_flight_async(key, _load_and_set)
+    except Exception as e:
+        if found is None:
+            raise
+        _count("stale_on_error")
+        logger.warning(f"cache serving stale value for {key} after load error: {e}")
+        return found[0]
@@ -0,0 +1,297 @@
+# backend/catalog.py
+"""
+Columnar meal catalog.
+
+Meals are stored column-wise instead of as one dict per meal:
+- NumPy arrays for the nutrients and cost
+- meal types as small integer codes
+- ingredients/allergens as interned vocabulary IDs in CSR layout
+  (offsets[i]:offsets[i+1] slices the ID array for meal i)
+- names as fixed-width UTF-8 byte arrays (display + lowercased for search)
+
+A catalog built once with `python catalog.py build <src> <dir>` is loaded
+from that directory with memory-mapped arrays, so startup is near instant
+and every worker shares the same pages instead of holding its own copy.
+Sources: .json (list of meals), .jsonl, or a SQLite file with a `meals` table.
+
+Indexing a catalog (catalog[i]) materializes the same dict shape MEAL_DB
+entries have always had, so callers that want one meal keep working.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+
+# -----------------------------
+# Schema
+# -----------------------------
+
+NUTRIENT_COLUMNS = ("calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium_mg")
+DEFAULT_MEAL_TYPES = ("breakfast", "lunch", "dinner")
+
+_ARRAY_COLUMNS = NUTRIENT_COLUMNS + (
+    "cost_estimate",
+    "meal_type",
+    "name",
+    "name_lower",
+    "ingredient_offsets",
+    "ingredient_ids",
+    "allergen_offsets",
+    "allergen_ids",
+)
+_META_FILE = "catalog.json"
+
+
+def _lower(x: Any) -> str:
+    return str(x).strip().lower() if x is not None else ""
+
+
+def _number(x: Any) -> Any:
+    # Keep ints as ints in materialized meals (the catalog stores floats)
+    x = float(x)
+    return int(x) if x.is_integer() else x
+
+
+# -----------------------------
+# Catalog
+# -----------------------------
+
+class MealCatalog(Sequence[Dict[str, Any]]):
+    """
+    Read-only columnar meal table. Meal IDs are row positions.
+    """
+
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        meal_types: Sequence[str],
+        ingredient_vocab: Sequence[str],
+        allergen_vocab: Sequence[str],
+    ):
+        self.columns = columns
+        self.meal_types = list(meal_types)
+        self.ingredient_vocab = list(ingredient_vocab)
+        self.allergen_vocab = list(allergen_vocab)
+
+        self.meal_type = columns["meal_type"]
+        self.cost = columns["cost_estimate"]
+        self.names = columns["name"]
+        self.names_lower = columns["name_lower"]
+        self.ingredient_offsets = columns["ingredient_offsets"]
+        self.ingredient_ids = columns["ingredient_ids"]
+        self.allergen_offsets = columns["allergen_offsets"]
+        self.allergen_ids = columns["allergen_ids"]
+
+    # --- Sequence protocol ---
+
+    def __len__(self) -> int:
+        return int(self.meal_type.shape[0])
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self.meal(j) for j in range(*i.indices(len(self)))]
+        return self.meal(int(i))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.meal(i)
+
+    # --- Rows ---
+
+    def name(self, i: int) -> str:
+        return self.names[i].decode("utf-8")
+
+    def ingredients(self, i: int) -> List[str]:
+        lo, hi = self.ingredient_offsets[i], self.ingredient_offsets[i + 1]
+        return [self.ingredient_vocab[j] for j in self.ingredient_ids[lo:hi]]
+
+    def allergens(self, i: int) -> List[str]:
+        lo, hi = self.allergen_offsets[i], self.allergen_offsets[i + 1]
+        return [self.allergen_vocab[j] for j in self.allergen_ids[lo:hi]]
+
+    def meal(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("meal id out of range")
+        meal: Dict[str, Any] = {
+            "meal_type": self.meal_types[int(self.meal_type[i])],
+            "name": self.name(i),
+        }
+        for col in NUTRIENT_COLUMNS:
+            meal[col] = _number(self.columns[col][i])
+        meal["ingredients"] = self.ingredients(i)
+        meal["cost_estimate"] = float(self.cost[i])
+        meal["allergens"] = self.allergens(i)
+        return meal
+
+    # --- Column masks (bool array over all meals) ---
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def type_mask(self, meal_type: str) -> np.ndarray:
+        if meal_type not in self.meal_types:
+            return np.zeros(len(self), dtype=bool)
+        return self.meal_type == self.meal_types.index(meal_type)
+
+    def name_contains(self, term: str, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Meals whose lowercased name contains `term`; with `ids`, only those
+        rows are scanned and the mask is aligned to `ids`.
+        """
+        names = self.names_lower if ids is None else self.names_lower[ids]
+        return np.char.find(names, _lower(term).encode("utf-8")) >= 0
+
+    def name_ids(self, name_lower: str) -> np.ndarray:
+        return np.flatnonzero(self.names_lower == _lower(name_lower).encode("utf-8"))
+
+    def any_ingredient(self, vocab_hits: np.ndarray) -> np.ndarray:
+        """
+        Meals with at least one ingredient whose vocab ID is set in vocab_hits.
+        """
+        return _any_in_rows(vocab_hits, self.ingredient_ids, self.ingredient_offsets)
+
+    def any_allergen(self, vocab_hits: np.ndarray) -> np.ndarray:
+        return _any_in_rows(vocab_hits, self.allergen_ids, self.allergen_offsets)
+
+    # --- Persistence ---
+
+    def save(self, directory: str | Path) -> None:
+        """
+        Write one .npy per column plus vocabularies, loadable with mmap.
+        """
+        out = Path(directory)
+        out.mkdir(parents=True, exist_ok=True)
+        for col in _ARRAY_COLUMNS:
+            np.save(out / f"{col}.npy", np.ascontiguousarray(self.columns[col]))
+        (out / _META_FILE).write_text(json.dumps({
+            "count": len(self),
+            "meal_types": self.meal_types,
+            "ingredient_vocab": self.ingredient_vocab,
+            "allergen_vocab": self.allergen_vocab,
+        }))
+
+    @classmethod
+    def from_meals(cls, meals: Iterable[Dict[str, Any]]) -> "MealCatalog":
+        """
+        Build from meal dicts (the MEAL_DB shape). Streams: only the columns
+        are kept, not the dicts.
+        """
+        meal_types: Dict[str, int] = {t: i for i, t in enumerate(DEFAULT_MEAL_TYPES)}
+        ing_vocab: Dict[str, int] = {}
+        all_vocab: Dict[str, int] = {}
+        cols: Dict[str, List[Any]] = {c: [] for c in NUTRIENT_COLUMNS + ("cost_estimate", "meal_type", "name")}
+        ing_ids: List[int] = []
+        ing_offsets = [0]
+        all_ids: List[int] = []
+        all_offsets = [0]
+
+        for m in meals:
+            mt = _lower(m.get("meal_type"))
+            cols["meal_type"].append(meal_types.setdefault(mt, len(meal_types)))
+            cols["name"].append(str(m.get("name") or ""))
+            for col in NUTRIENT_COLUMNS:
+                cols[col].append(float(m.get(col) or 0))
+            cols["cost_estimate"].append(float(m.get("cost_estimate") or 0.0))
+            for ing in m.get("ingredients") or []:
+                ing_ids.append(ing_vocab.setdefault(str(ing), len(ing_vocab)))
+            ing_offsets.append(len(ing_ids))
+            for a in m.get("allergens") or []:
+                all_ids.append(all_vocab.setdefault(str(a), len(all_vocab)))
+            all_offsets.append(len(all_ids))
+
+        names = [n.encode("utf-8") for n in cols["name"]]
+        columns = {col: np.asarray(cols[col], dtype=np.float32) for col in NUTRIENT_COLUMNS}
+        columns.update({
+            "cost_estimate": np.asarray(cols["cost_estimate"], dtype=np.float64),
+            "meal_type": np.asarray(cols["meal_type"], dtype=np.int16),
+            "name": np.asarray(names, dtype=f"S{max((len(n) for n in names), default=1) or 1}"),
+            "name_lower": np.asarray(
+                [_lower(n).encode("utf-8") for n in cols["name"]],
+                dtype=f"S{max((len(_lower(n).encode('utf-8')) for n in cols['name']), default=1) or 1}",
+            ),
+            "ingredient_offsets": np.asarray(ing_offsets, dtype=np.int64),
+            "ingredient_ids": np.asarray(ing_ids, dtype=np.int32),
+            "allergen_offsets": np.asarray(all_offsets, dtype=np.int64),
+            "allergen_ids": np.asarray(all_ids, dtype=np.int32),
+        })
+        return cls(columns, list(meal_types), list(ing_vocab), list(all_vocab))
+
+
+def _any_in_rows(vocab_hits: np.ndarray, ids: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    # Count hits per CSR row: cumulative sum sampled at the row boundaries
+    hits = np.concatenate(([0], np.cumsum(vocab_hits[ids], dtype=np.int64)))
+    return hits[offsets[1:]] > hits[offsets[:-1]]
+
+
+# -----------------------------
+# Loaders
+# -----------------------------
+
+def _iter_json(path: Path) -> Iterator[Dict[str, Any]]:
+    if path.suffix == ".jsonl":
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from json.loads(path.read_text(encoding="utf-8"))
+
+
+def _iter_sqlite(path: Path, table: str = "meals") -> Iterator[Dict[str, Any]]:
+    """
+    Rows of a `meals` table with MEAL_DB columns; ingredients and allergens
+    are JSON arrays (or comma-separated text).
+    """
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        for row in conn.execute(f"SELECT * FROM {table}"):
+            meal = dict(row)
+            for key in ("ingredients", "allergens"):
+                raw = meal.get(key)
+                if isinstance(raw, str):
+                    raw = raw.strip()
+                    meal[key] = json.loads(raw) if raw.startswith("[") else [t.strip() for t in raw.split(",") if t.strip()]
+            yield meal
+    finally:
+        conn.close()
+
+
+def _load_columnar(directory: Path, mmap: bool) -> MealCatalog:
+    meta = json.loads((directory / _META_FILE).read_text(encoding="utf-8"))
+    mode = "r" if mmap else None
+    columns = {col: np.load(directory / f"{col}.npy", mmap_mode=mode) for col in _ARRAY_COLUMNS}
+    return MealCatalog(columns, meta["meal_types"], meta["ingredient_vocab"], meta["allergen_vocab"])
+
+
+def load_catalog(path: str | Path, mmap: bool = True) -> MealCatalog:
+    """
+    Load a catalog from a columnar directory (memory-mapped by default),
+    a .json/.jsonl file of meals, or a SQLite database with a `meals` table.
+    """
+    p = Path(path)
+    if p.is_dir():
+        return _load_columnar(p, mmap)
+    if p.suffix in {".json", ".jsonl"}:
+        return MealCatalog.from_meals(_iter_json(p))
+    if p.suffix in {".db", ".sqlite", ".sqlite3"}:
+        return MealCatalog.from_meals(_iter_sqlite(p))
+    raise ValueError(f"unsupported meal catalog source: {path}")
+
+
+if __name__ == "__main__":
+    # python catalog.py build <meals.json|meals.jsonl|meals.db> <out_dir>
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        sys.exit("usage: python catalog.py build <source> <out_dir>")
+    catalog = load_catalog(sys.argv[2], mmap=False)
+    catalog.save(sys.argv[3])
+    print(f"wrote {len(catalog)} meals to {sys.argv[3]}")
@@ -3,9 +3,12 @@ from __future__ import annotations
 
 import sqlite3
 import json
+import time
 from typing import Optional, List, Dict, Any
 from pathlib import Path
 
+import maps
+
 # -----------------------------
 # Database location
 # -----------------------------
@@ -105,6 +108,44 @@ def init_db():
     )
     """)
 
+    # -------------------------
+    # Stores seen via Google Places (local spatial index)
+    # -------------------------
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS stores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        place_id TEXT UNIQUE NOT NULL,
+        name TEXT,
+        lat REAL NOT NULL,
+        lng REAL NOT NULL,
+        place_json TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS stores_rtree USING rtree(
+        id, min_lat, max_lat, min_lng, max_lng
+    )
+    """)
+
+    # -------------------------
+    # Areas already searched upstream (circle + when)
+    # -------------------------
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS store_searches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        lat REAL NOT NULL,
+        lng REAL NOT NULL,
+        radius_km REAL NOT NULL,
+        searched_at REAL NOT NULL
+    )
+    """)
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS store_searches_rtree USING rtree(
+        id, min_lat, max_lat, min_lng, max_lng
+    )
+    """)
+
     conn.commit()
     conn.close()
 
@@ -250,3 +291,156 @@ def get_grocery_lists(user_id: str) -> List[Dict]:
         }
         for row in rows
     ]
+
+
+# -----------------------------
+# Store index operations
+# -----------------------------
+
+def upsert_stores(places: List[Dict], searched_at: Optional[float] = None):
+    """
+    Insert/refresh raw Google Places results, keyed by place_id.
+    """
+    now = searched_at or time.time()
+    conn = get_db()
+    cur = conn.cursor()
+
+    for p in places:
+        loc = p["geometry"]["location"]
+        cur.execute("""
+        INSERT INTO stores (place_id, name, lat, lng, place_json, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(place_id) DO UPDATE SET
+            name = excluded.name,
+            lat = excluded.lat,
+            lng = excluded.lng,
+            place_json = excluded.place_json,
+            updated_at = excluded.updated_at
+        """, (p["place_id"], p.get("name"), loc["lat"], loc["lng"], json.dumps(p), now))
+
+        store_id = cur.execute(
+            "SELECT id FROM stores WHERE place_id = ?", (p["place_id"],)
+        ).fetchone()["id"]
+        cur.execute("""
+        INSERT OR REPLACE INTO stores_rtree (id, min_lat, max_lat, min_lng, max_lng)
+        VALUES (?, ?, ?, ?, ?)
+        """, (store_id, loc["lat"], loc["lat"], loc["lng"], loc["lng"]))
+
+    conn.commit()
+    conn.close()
+
+
+def record_store_search(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    searched_at: Optional[float] = None,
+    retain_seconds: Optional[float] = None,
+):
+    """
+    Remember that the circle was fully searched upstream.
+    Searches older than retain_seconds are pruned at the same time.
+    """
+    now = searched_at or time.time()
+    min_lat, max_lat, min_lng, max_lng = maps.bounding_box(lat, lng, radius_km)
+    conn = get_db()
+    cur = conn.cursor()
+
+    cur.execute("""
+    INSERT INTO store_searches (lat, lng, radius_km, searched_at)
+    VALUES (?, ?, ?, ?)
+    """, (lat, lng, radius_km, now))
+    cur.execute("""
+    INSERT INTO store_searches_rtree (id, min_lat, max_lat, min_lng, max_lng)
+    VALUES (?, ?, ?, ?, ?)
+    """, (cur.lastrowid, min_lat, max_lat, min_lng, max_lng))
+
+    # Stores inside the circle that this search did not return (upserted
+    # with the same timestamp) have closed or been delisted
+    cur.execute("""
+    SELECT s.id, s.lat, s.lng
+    FROM stores_rtree r
+    JOIN stores s ON s.id = r.id
+    WHERE r.min_lat >= ? AND r.max_lat <= ?
+      AND r.min_lng >= ? AND r.max_lng <= ?
+      AND s.updated_at < ?
+    """, (min_lat, max_lat, min_lng, max_lng, now))
+    gone = [
+        (row["id"],)
+        for row in cur.fetchall()
+        if maps.within_radius(lat, lng, row["lat"], row["lng"], radius_km)
+    ]
+
+    if retain_seconds:
+        cutoff = now - retain_seconds
+        cur.execute("""
+        DELETE FROM store_searches_rtree
+        WHERE id IN (SELECT id FROM store_searches WHERE searched_at < ?)
+        """, (cutoff,))
+        cur.execute("DELETE FROM store_searches WHERE searched_at < ?", (cutoff,))
+        # Stores no search has returned within the retention window
+        gone += [(row["id"],) for row in cur.execute("SELECT id FROM stores WHERE updated_at < ?", (cutoff,))]
+
+    cur.executemany("DELETE FROM stores_rtree WHERE id = ?", gone)
+    cur.executemany("DELETE FROM stores WHERE id = ?", gone)
+
+    conn.commit()
+    conn.close()
+
+
+def fresh_store_search_at(lat: float, lng: float, radius_km: float, max_age_seconds: float) -> Optional[float]:
+    """
+    searched_at of the newest search within max_age_seconds that fully
+    contains this circle, or None.
+    """
+    conn = get_db()
+    cur = conn.cursor()
+
+    # R*Tree: searches whose bounding box contains the query center
+    cur.execute("""
+    SELECT s.lat, s.lng, s.radius_km, s.searched_at
+    FROM store_searches_rtree r
+    JOIN store_searches s ON s.id = r.id
+    WHERE r.min_lat <= ? AND r.max_lat >= ?
+      AND r.min_lng <= ? AND r.max_lng >= ?
+      AND s.searched_at >= ?
+    """, (lat, lat, lng, lng, time.time() - max_age_seconds))
+
+    rows = cur.fetchall()
+    conn.close()
+
+    covering = [
+        row["searched_at"]
+        for row in rows
+        if maps.distance_km(lat, lng, row["lat"], row["lng"]) + radius_km <= row["radius_km"]
+    ]
+    return max(covering) if covering else None
+
+
+def stores_within(lat: float, lng: float, radius_km: float, since: Optional[float] = None) -> List[Dict]:
+    """
+    Raw Places results stored locally within radius_km of (lat, lng).
+    With `since`, only stores refreshed at or after that time (i.e. returned
+    by the covering search) are included.
+    """
+    min_lat, max_lat, min_lng, max_lng = maps.bounding_box(lat, lng, radius_km)
+    conn = get_db()
+    cur = conn.cursor()
+
+    cur.execute("""
+    SELECT s.lat, s.lng, s.place_json
+    FROM stores_rtree r
+    JOIN stores s ON s.id = r.id
+    WHERE r.min_lat >= ? AND r.max_lat <= ?
+      AND r.min_lng >= ? AND r.max_lng <= ?
+      AND s.updated_at >= ?
+    """, (min_lat, max_lat, min_lng, max_lng, since or 0.0))
+
+    rows = cur.fetchall()
+    conn.close()
+
+    return [
+        json.loads(row["place_json"])
+        for row in rows
+        if maps.within_radius(lat, lng, row["lat"], row["lng"], radius_km)
+    ]
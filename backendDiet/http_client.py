@@ -0,0 +1,201 @@
+# backend/http_client.py
+"""
+Shared outbound HTTP clients.
+
+One pooled requests.Session for sync code and one httpx.AsyncClient for
+coroutines, so upstream calls (Google Places) reuse keep-alive connections
+instead of paying TCP+TLS setup on every request.
+
+Per-host limits:
+- sync: urllib3 keeps at most HTTP_MAX_PER_HOST connections per host and
+  blocks further callers until one is free (pool_block=True)
+- async: an asyncio.Semaphore per host caps in-flight requests
+
+The async client and semaphores belong to the event loop that first used
+them; a call from another loop (tests, reload) replaces them. Call aclose()
+on shutdown, from that loop, to release the pooled connections.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Optional httpx (kept isolated so the sync path works without it; the async
+# helpers then run the pooled sync client in a worker thread)
+try:
+    import httpx
+    _HAS_HTTPX = True
+except ImportError:
+    httpx = None
+    _HAS_HTTPX = False
+
+
+# -----------------------------
+# Settings
+# -----------------------------
+
+HTTP_MAX_HOSTS = int(os.getenv("HTTP_MAX_HOSTS", "10"))          # distinct hosts kept pooled
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "20"))    # connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+DEFAULT_TIMEOUT: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+# -----------------------------
+# Sync client (requests)
+# -----------------------------
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def session() -> requests.Session:
+    """
+    Process-wide pooled session (created on first use).
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_MAX_HOSTS,
+                    pool_maxsize=HTTP_MAX_PER_HOST,
+                    pool_block=True,
+                )
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _SESSION = s
+    return _SESSION
+
+
+def get(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[Tuple[float, float]] = None,
+) -> requests.Response:
+    """
+    GET through the shared session with (connect, read) timeouts.
+    """
+    return session().get(url, params=params, timeout=timeout or DEFAULT_TIMEOUT)
+
+
+def close() -> None:
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+
+
+# -----------------------------
+# Async client (httpx)
+# -----------------------------
+
+_ASYNC_CLIENT: Optional["httpx.AsyncClient"] = None
+_ASYNC_LOOP: Optional[asyncio.AbstractEventLoop] = None  # loop the two below belong to
+_HOST_SEMAPHORES: Dict[str, asyncio.Semaphore] = {}
+
+
+class AsyncResponse:
+    """
+    Minimal response shape shared by both async backends
+    (status check + JSON body), mirroring what callers use from requests.
+    """
+
+    def __init__(self, status_code: int, body: Any, url: str):
+        self.status_code = status_code
+        self._body = body
+        self.url = url
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error for url: {self.url}")
+
+    def json(self) -> Any:
+        return self._body
+
+
+def _bind_loop() -> None:
+    # Connections and semaphores can't be shared across event loops: start
+    # fresh when a different loop calls in (the old one is gone or idle)
+    global _ASYNC_CLIENT, _ASYNC_LOOP
+    loop = asyncio.get_running_loop()
+    if loop is not _ASYNC_LOOP:
+        _ASYNC_CLIENT = None
+        _HOST_SEMAPHORES.clear()
+        _ASYNC_LOOP = loop
+
+
+def _async_client() -> "httpx.AsyncClient":
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None:
+        _ASYNC_CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_HOSTS * HTTP_MAX_PER_HOST,
+                max_keepalive_connections=HTTP_MAX_HOSTS * HTTP_MAX_PER_HOST,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _ASYNC_CLIENT
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    sem = _HOST_SEMAPHORES.get(host)
+    if sem is None:
+        sem = _HOST_SEMAPHORES[host] = asyncio.Semaphore(HTTP_MAX_PER_HOST)
+    return sem
+
+
+async def aget(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[Tuple[float, float]] = None,
+) -> AsyncResponse:
+    """
+    Non-blocking GET. Uses httpx when installed, otherwise the pooled sync
+    session in a worker thread. The body is read and JSON-decoded eagerly;
+    a success response that isn't JSON (including an empty body) raises
+    requests.JSONDecodeError, like Response.json() on the sync path.
+    """
+    if not _HAS_HTTPX:
+        resp = await asyncio.to_thread(get, url, params, timeout)
+        body = resp.json() if resp.status_code < 400 else None
+        return AsyncResponse(resp.status_code, body, url)
+
+    _bind_loop()
+    connect, read = timeout or DEFAULT_TIMEOUT
+    async with _host_semaphore(url):
+        resp = await _async_client().get(
+            url,
+            params=params,
+            timeout=httpx.Timeout(read, connect=connect),
+        )
+    body = None
+    if resp.status_code < 400:
+        try:
+            body = resp.json()
+        except ValueError as e:
+            raise requests.JSONDecodeError(getattr(e, "msg", str(e)), resp.text, getattr(e, "pos", 0)) from e
+    return AsyncResponse(resp.status_code, body, str(resp.url))
+
+
+async def aclose() -> None:
+    global _ASYNC_CLIENT, _ASYNC_LOOP
+    # A client from another (closed) loop can't be closed from here; drop it
+    if _ASYNC_CLIENT is not None and _ASYNC_LOOP is asyncio.get_running_loop():
+        await _ASYNC_CLIENT.aclose()
+        _ASYNC_CLIENT = None
+    _ASYNC_LOOP = None
+    _HOST_SEMAPHORES.clear()
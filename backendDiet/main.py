@@ -2,15 +2,23 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from logging_config import logger
 
 # Internal modules
+import cache
+import db
+import http_client
+import maps
 import nutrition as nut
 import ai as diet_ai
+import routes
 import stores as store_mod
 
 
@@ -33,6 +41,31 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def start_background_tasks():
+    db.init_db()
+    # Store coverage interns the catalog's ingredients; anything else a
+    # client sends is classified per request
+    store_mod.register_ingredients(diet_ai.MEAL_DB.ingredient_vocab)
+
+    # Opt-in: reclaim expired cache entries off the request path
+    if cache.CACHE_SWEEP_SECONDS > 0:
+        cache.start_sweeper()
+
+
+@app.on_event("shutdown")
+def stop_background_tasks():
+    cache.stop_sweeper()
+    # Commit queued write-behind entries so the next worker starts warm
+    cache.disable_l2()
+    http_client.close()
+
+
+@app.on_event("shutdown")
+async def close_async_clients():
+    await http_client.aclose()
+
+
 # -----------------------------
 # Pydantic request models
 # -----------------------------
@@ -63,10 +96,12 @@ class MealsPayload(BaseModel):
 
 class MealPlanRequest(BaseModel):
     user_profile: Dict[str, Any]
+    optimize: bool = Field(False, description="pick the catalog day closest to the macro targets")
 
 
 class WeeklyMealPlanRequest(BaseModel):
     user_profile: Dict[str, Any]
+    mode: Optional[str] = Field(None, description="batched/parallel (default: WEEKLY_MODE)")
 
 
 class MealSwapRequest(BaseModel):
@@ -130,6 +165,28 @@ class StoreMealMatchRequest(BaseModel):
     store: Dict[str, Any]
     meals: List[Dict[str, Any]]
 
+
+class StoreCoverRequest(BaseModel):
+    user_profile: Dict[str, Any]
+    meals: List[Dict[str, Any]]
+    lat: float
+    lng: float
+    radius_km: float = 5.0
+
+
+class RouteRequest(BaseModel):
+    lat: float
+    lng: float
+    stops: List[Dict[str, Any]]  # store objects from /stores (or {lat, lng})
+    return_to_start: bool = False
+
+
+class DistanceMatrixRequest(BaseModel):
+    origins: List[Tuple[float, float]]                        # [lat, lng] pairs
+    destinations: Optional[List[Tuple[float, float]]] = None  # default: origins x origins
+    decimals: int = Field(3, ge=0, le=6)
+    encoding: str = Field("json", description="json (nested lists) or f32 (base64 little-endian float32, row-major)")
+
 # -----------------------------
 # Rate limiting (simple IP-based)
 # -----------------------------
@@ -208,7 +265,7 @@ def macros(profile: UserProfile):
 @app.post("/meal-plan", dependencies=[Depends(rate_limit)])
 def meal_plan(req: MealPlanRequest):
     try:
-        meals = diet_ai.generate_meal_plan(req.user_profile)
+        meals = diet_ai.generate_meal_plan(req.user_profile, optimize=req.optimize)
         nutrition = nut.calculate_nutrition(meals)
         score = nut.nutrition_score(meals, req.user_profile)
 
@@ -224,7 +281,7 @@ def meal_plan(req: MealPlanRequest):
 @app.post("/weekly-meal-plan", dependencies=[Depends(rate_limit)])
 def weekly_meal_plan(req: WeeklyMealPlanRequest):
     try:
-        weekly = diet_ai.generate_weekly_meal_plan(req.user_profile)
+        weekly = diet_ai.generate_weekly_meal_plan(req.user_profile, mode=req.mode)
         return {"week": weekly}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"weekly-meal-plan failed: {str(e)}")
@@ -304,29 +361,127 @@ def diet_compliance(req: DietComplianceRequest):
     return {"ok": ok, "reasons": reasons}
 
 
+# -----------------------------
+# Maps (batch geometry)
+# -----------------------------
+
+DISTANCE_MATRIX_MAX_POINTS = 5000       # per side
+DISTANCE_MATRIX_MAX_CELLS = 250_000      # ~1 MB as f32
+DISTANCE_MATRIX_MAX_JSON_CELLS = 10_000  # larger matrices must use encoding=f32
+
+
+@app.post("/distance-matrix", dependencies=[Depends(rate_limit)])
+def distance_matrix(req: DistanceMatrixRequest):
+    # One vectorized haversine pass instead of a distance_km call per pair
+    dests = req.destinations if req.destinations is not None else req.origins
+    m, n = len(req.origins), len(dests)
+    if max(m, n) > DISTANCE_MATRIX_MAX_POINTS or m * n > DISTANCE_MATRIX_MAX_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"distance matrix limited to {DISTANCE_MATRIX_MAX_POINTS} points per side "
+                   f"and {DISTANCE_MATRIX_MAX_CELLS} cells",
+        )
+    if req.encoding not in {"json", "f32"}:
+        raise HTTPException(status_code=400, detail="encoding must be json or f32")
+    if req.encoding == "json" and m * n > DISTANCE_MATRIX_MAX_JSON_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"use encoding=f32 for matrices over {DISTANCE_MATRIX_MAX_JSON_CELLS} cells",
+        )
+
+    matrix = maps.distance_matrix(
+        [p[0] for p in req.origins],
+        [p[1] for p in req.origins],
+        [p[0] for p in dests],
+        [p[1] for p in dests],
+    )
+    out: Dict[str, Any] = {"rows": m, "cols": n, "unit": "km"}
+    if req.encoding == "f32":
+        out["encoding"] = "f32"
+        out["data"] = base64.b64encode(matrix.astype("<f4").tobytes()).decode("ascii")
+    else:
+        out["encoding"] = "json"
+        out["data"] = matrix.round(req.decimals).tolist()
+    # Plain lists of floats: skip FastAPI's per-element jsonable_encoder walk
+    return JSONResponse(out)
+
+
 # -----------------------------
 # Stores / Maps (REAL Google Places via stores.py)
 # -----------------------------
 
 @app.get("/stores", dependencies=[Depends(rate_limit)])
-def stores(
+async def stores(
     lat: float = Query(..., description="User latitude"),
     lng: float = Query(..., description="User longitude"),
-    radius_km: float = Query(5.0, description="Search radius in km"),
+    radius_km: float = Query(5.0, gt=0, le=50, description="Search radius in km"),
+    local_index: bool = Query(False, description="Answer from the local store index when the area is fresh"),
+    limit: Optional[int] = Query(None, ge=1, description="Return only the best N stores"),
+    min_score: Optional[float] = Query(None, description="Drop stores scoring below this"),
 ):
     try:
-        # Returns live Google Places results enriched with your scoring fields
-        return store_mod.find_stores(
+        # Returns live Google Places results enriched with your scoring fields.
+        # Native coroutine: waiting on Google does not tie up a worker thread.
+        return await store_mod.find_stores_async(
             lat=lat,
             lng=lng,
             meals=None,
             user_profile=None,
             radius_km=radius_km,
+            local_index=local_index,
+            limit=limit,
+            min_score=min_score,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"stores lookup failed: {str(e)}")
 
 
+@app.get("/stores/stream", dependencies=[Depends(rate_limit)])
+async def stores_stream(
+    lat: float = Query(..., description="User latitude"),
+    lng: float = Query(..., description="User longitude"),
+    radius_km: float = Query(5.0, gt=0, le=50, description="Search radius in km"),
+    min_score: Optional[float] = Query(None, description="Drop stores scoring below this"),
+):
+    # NDJSON: one scored store per line, written as each Places page arrives
+    # so the map can drop the first pins before paging finishes.
+    async def lines():
+        try:
+            async for batch in store_mod.stream_stores(
+                lat=lat, lng=lng, radius_km=radius_km, min_score=min_score
+            ):
+                for store in batch:
+                    yield json.dumps(store) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            logger.error(f"stores stream failed: {e}")
+            yield json.dumps({"error": f"stores lookup failed: {str(e)}"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/stores/cover", dependencies=[Depends(rate_limit)])
+def stores_cover(req: StoreCoverRequest):
+    # Fewest nearby stores that together stock the whole grocery list
+    try:
+        grocery = diet_ai.generate_grocery_list(req.meals)
+        cover = store_mod.cover_stores(
+            req.lat, req.lng, grocery["items"], req.user_profile, radius_km=req.radius_km
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"stores cover failed: {str(e)}")
+    return {**cover, "unresolved_meals": grocery["missing"]}
+
+
+@app.post("/route", dependencies=[Depends(rate_limit)])
+def route(req: RouteRequest):
+    # Visit order for the chosen stores, starting from the user
+    try:
+        return routes.plan_route(req.lat, req.lng, req.stops, return_to_start=req.return_to_start)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/store-score")
 def store_score(req: StoreScoreRequest):
     # store returned by /stores contains distance_km, price_level, etc.
@@ -2,7 +2,9 @@
 from __future__ import annotations
 
 from math import radians, sin, cos, sqrt, atan2
-from typing import Tuple
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
 
 
 # -----------------------------
@@ -41,6 +43,63 @@ def distance_km(
     return EARTH_RADIUS_KM * c
 
 
+# -----------------------------
+# Batch distance (vectorized haversine)
+# -----------------------------
+
+def distance_km_batch(
+    lat: float,
+    lng: float,
+    lats: Sequence[float],
+    lngs: Sequence[float],
+):
+    """
+    Distances (km) from one point to many coordinates.
+    Returns a float64 NumPy array.
+    """
+    lat1_r, lng1_r = radians(lat), radians(lng)
+    lat2_r = np.radians(np.asarray(lats, dtype=np.float64))
+    lng2_r = np.radians(np.asarray(lngs, dtype=np.float64))
+
+    a = (
+        np.sin((lat2_r - lat1_r) / 2) ** 2
+        + cos(lat1_r) * np.cos(lat2_r) * np.sin((lng2_r - lng1_r) / 2) ** 2
+    )
+    a = np.clip(a, 0.0, 1.0)  # guard sqrt(1 - a) against rounding
+
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+def distance_matrix(
+    lats: Sequence[float],
+    lngs: Sequence[float],
+    dest_lats: Optional[Sequence[float]] = None,
+    dest_lngs: Optional[Sequence[float]] = None,
+):
+    """
+    Distances (km) from m origins to n destinations as an m x n float64
+    NumPy array. Without destinations, the symmetric matrix between the
+    origins themselves.
+    """
+    if dest_lats is None or dest_lngs is None:
+        dest_lats, dest_lngs = lats, lngs
+
+    lat1_r = np.radians(np.asarray(lats, dtype=np.float64))[:, None]
+    lng1_r = np.radians(np.asarray(lngs, dtype=np.float64))[:, None]
+    lat2_r = np.radians(np.asarray(dest_lats, dtype=np.float64))[None, :]
+    lng2_r = np.radians(np.asarray(dest_lngs, dtype=np.float64))[None, :]
+
+    a = (
+        np.sin((lat2_r - lat1_r) / 2) ** 2
+        + np.cos(lat1_r) * np.cos(lat2_r) * np.sin((lng2_r - lng1_r) / 2) ** 2
+    )
+    a = np.clip(a, 0.0, 1.0)
+
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
 # -----------------------------
 # Radius check
 # -----------------------------
@@ -82,6 +141,23 @@ def bounding_box(
     )
 
 
+def bounding_box_mask(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    lats: Sequence[float],
+    lngs: Sequence[float],
+):
+    """
+    Which coordinates fall inside bounding_box(lat, lng, radius_km).
+    Boolean NumPy array; a cheap prefilter before exact distances.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    la = np.asarray(lats, dtype=np.float64)
+    ln = np.asarray(lngs, dtype=np.float64)
+    return (la >= min_lat) & (la <= max_lat) & (ln >= min_lng) & (ln <= max_lng)
+
+
 # -----------------------------
 # Utility: midpoint (optional)
 # -----------------------------
@@ -109,3 +185,162 @@ def midpoint(
     lng3 = lng1_r + atan2(by, cos(lat1_r) + bx)
 
     return (lat3 * 180 / 3.141592653589793, lng3 * 180 / 3.141592653589793)
+
+
+def midpoint_batch(
+    lats1: Sequence[float],
+    lngs1: Sequence[float],
+    lats2: Sequence[float],
+    lngs2: Sequence[float],
+):
+    """
+    Element-wise midpoints of coordinate pairs.
+    Returns (lats, lngs) as NumPy arrays.
+    """
+    lat1_r = np.radians(np.asarray(lats1, dtype=np.float64))
+    lng1_r = np.radians(np.asarray(lngs1, dtype=np.float64))
+    lat2_r = np.radians(np.asarray(lats2, dtype=np.float64))
+    lng2_r = np.radians(np.asarray(lngs2, dtype=np.float64))
+
+    bx = np.cos(lat2_r) * np.cos(lng2_r - lng1_r)
+    by = np.cos(lat2_r) * np.sin(lng2_r - lng1_r)
+
+    lat3 = np.arctan2(
+        np.sin(lat1_r) + np.sin(lat2_r),
+        np.sqrt((np.cos(lat1_r) + bx) ** 2 + by ** 2),
+    )
+    lng3 = lng1_r + np.arctan2(by, np.cos(lat1_r) + bx)
+
+    return np.degrees(lat3), np.degrees(lng3)
+
+
+# -----------------------------
+# Geohash (spatial keys / bucketing)
+# -----------------------------
+
+GEOHASH_MAX_PRECISION = 12
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_GEOHASH_INDEX = {c: i for i, c in enumerate(_GEOHASH_BASE32)}
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 7) -> str:
+    """
+    Encode a coordinate as a geohash of `precision` characters.
+    A shorter hash is always a prefix of a longer one for the same point.
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+
+    chars = []
+    bits = 0
+    n_bits = 0
+    even = True  # geohash interleaves bits starting with longitude
+
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = bits * 2 + 1
+                lng_lo = mid
+            else:
+                bits = bits * 2
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = bits * 2 + 1
+                lat_lo = mid
+            else:
+                bits = bits * 2
+                lat_hi = mid
+        even = not even
+
+        n_bits += 1
+        if n_bits == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            n_bits = 0
+
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """
+    Cell bounds of a geohash.
+    Returns: (min_lat, max_lat, min_lng, max_lng), same order as bounding_box.
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+
+    for ch in geohash.lower():
+        value = _GEOHASH_INDEX[ch]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+
+    return (lat_lo, lat_hi, lng_lo, lng_hi)
+
+
+def geohash_decode(geohash: str) -> Tuple[float, float]:
+    """
+    Center (lat, lng) of a geohash cell.
+    """
+    min_lat, max_lat, min_lng, max_lng = geohash_bounds(geohash)
+    return ((min_lat + max_lat) / 2, (min_lng + max_lng) / 2)
+
+
+def geohash_neighbors(geohash: str) -> List[str]:
+    """
+    The 8 surrounding cells (N, NE, E, SE, S, SW, W, NW) at the same precision.
+    Longitude wraps at the antimeridian; cells past a pole are omitted.
+    """
+    min_lat, max_lat, min_lng, max_lng = geohash_bounds(geohash)
+    lat_c, lng_c = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    d_lat, d_lng = max_lat - min_lat, max_lng - min_lng
+    precision = len(geohash)
+
+    out = []
+    for dy, dx in ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)):
+        lat = lat_c + dy * d_lat
+        if lat > 90.0 or lat < -90.0:
+            continue
+        lng = (lng_c + dx * d_lng + 180.0) % 360.0 - 180.0
+        out.append(geohash_encode(lat, lng, precision))
+    return out
+
+
+def geohash_cell_size_km(precision: int, lat: float = 0.0) -> Tuple[float, float]:
+    """
+    Approximate (height_km, width_km) of a geohash cell at a given latitude.
+    """
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    height_km = 180.0 / (1 << lat_bits) * 111.0
+    width_km = 360.0 / (1 << lng_bits) * 111.0 * cos(radians(lat))
+    return (height_km, width_km)
+
+
+def geohash_precision_for_radius(radius_km: float, lat: float = 0.0) -> int:
+    """
+    Finest precision whose cells are at least radius_km on each side.
+    A circle of that radius around any point in a cell then lies within the
+    cell and its 8 neighbors.
+    """
+    for precision in range(GEOHASH_MAX_PRECISION, 0, -1):
+        if min(geohash_cell_size_km(precision, lat)) >= radius_km:
+            return precision
+    return 1
@@ -0,0 +1,205 @@
+# backend/routes.py
+"""
+Multi-stop shopping routes.
+
+Visit order from the user's location to a set of stores: exact DP
+(Held-Karp) for a handful of stops, nearest-neighbor + 2-opt above that.
+Store-to-store distances come from maps.distance_matrix and are cached per
+store set, so only the user's row is computed on repeat requests.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, List, Sequence, Tuple
+
+import cache
+import maps
+
+
+# -----------------------------
+# Settings
+# -----------------------------
+
+ROUTE_MAX_STOPS = 25
+ROUTE_EXACT_MAX_STOPS = 10        # Held-Karp is O(n^2 2^n): ~15 ms at 10
+ROUTE_MATRIX_TTL_S = 3600
+ROUTE_COORD_DECIMALS = 6          # ~0.1 m; stores keep their coordinates
+
+
+# -----------------------------
+# Distance matrix (cached per store set)
+# -----------------------------
+
+def _stop_coords(stop: Dict[str, Any]) -> Tuple[float, float]:
+    """
+    (lat, lng) of a stop given as a /stores entry ({"location": {...}}),
+    a raw Places result ({"geometry": {"location": {...}}}) or {"lat", "lng"}.
+    """
+    loc = stop.get("location") or (stop.get("geometry") or {}).get("location") or stop
+    try:
+        return float(loc["lat"]), float(loc["lng"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"stop has no coordinates: {stop.get('name') or stop.get('place_id') or stop}")
+
+
+def _store_matrix(coords: Sequence[Tuple[float, float]]) -> List[List[float]]:
+    """
+    Pairwise store distances in the order of `coords`. Cached under the
+    sorted coordinate set, so any ordering of the same stores hits.
+    """
+    rounded = [(round(a, ROUTE_COORD_DECIMALS), round(b, ROUTE_COORD_DECIMALS)) for a, b in coords]
+    canon = sorted(range(len(rounded)), key=rounded.__getitem__)
+    digest = hashlib.sha1(repr([rounded[i] for i in canon]).encode()).hexdigest()
+    key = f"route_matrix:{digest}"
+
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = maps.distance_matrix([rounded[i][0] for i in canon], [rounded[i][1] for i in canon]).tolist()
+        cache.set(key, matrix, ttl_seconds=ROUTE_MATRIX_TTL_S)
+
+    pos = [0] * len(canon)
+    for p, i in enumerate(canon):
+        pos[i] = p
+    return [[matrix[pos[i]][pos[j]] for j in range(len(pos))] for i in range(len(pos))]
+
+
+def _route_matrix(lat: float, lng: float, coords: Sequence[Tuple[float, float]]) -> List[List[float]]:
+    """
+    (n+1) x (n+1) distances with node 0 = the user and node i = stop i-1.
+    """
+    stores = _store_matrix(coords)
+    user = maps.distance_km_batch(lat, lng, [c[0] for c in coords], [c[1] for c in coords])
+    user = [float(x) for x in user]
+
+    d = [[0.0] + user]
+    for i, row in enumerate(stores):
+        d.append([user[i]] + row)
+    return d
+
+
+# -----------------------------
+# Solvers (node 0 fixed as the start)
+# -----------------------------
+
+def _path_length(route: Sequence[int], d: List[List[float]]) -> float:
+    return sum(d[route[i]][route[i + 1]] for i in range(len(route) - 1))
+
+
+def _solve_exact(d: List[List[float]], n: int, closed: bool) -> List[int]:
+    """
+    Held-Karp over stops 1..n. dp[mask][j]: shortest path from the user
+    through the stops in mask, ending at stop j+1.
+    """
+    inf = float("inf")
+    full = (1 << n) - 1
+    dp = [[inf] * n for _ in range(1 << n)]
+    parent = [[-1] * n for _ in range(1 << n)]
+    for j in range(n):
+        dp[1 << j][j] = d[0][j + 1]
+
+    for mask in range(1, full + 1):
+        row = dp[mask]
+        for j in range(n):
+            cost = row[j]
+            if cost == inf or not (mask >> j) & 1:
+                continue
+            dj = d[j + 1]
+            for k in range(n):
+                if (mask >> k) & 1:
+                    continue
+                nxt = mask | (1 << k)
+                c = cost + dj[k + 1]
+                if c < dp[nxt][k]:
+                    dp[nxt][k] = c
+                    parent[nxt][k] = j
+
+    last = min(range(n), key=lambda j: dp[full][j] + (d[j + 1][0] if closed else 0.0))
+    order, mask = [], full
+    while last >= 0:
+        order.append(last + 1)
+        mask, last = mask ^ (1 << last), parent[mask][last]
+    return order[::-1]
+
+
+def _nearest_neighbor(d: List[List[float]], n: int) -> List[int]:
+    order, current = [], 0
+    unvisited = set(range(1, n + 1))
+    while unvisited:
+        current = min(unvisited, key=d[current].__getitem__)
+        unvisited.remove(current)
+        order.append(current)
+    return order
+
+
+def _two_opt(route: List[int], d: List[List[float]], closed: bool) -> List[int]:
+    """
+    Reverse segments while any reversal shortens the route. route[0] (the
+    user) stays fixed, and so does the final return to it when closed.
+    """
+    last = len(route) - 2 if closed else len(route) - 1
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, last):
+            a, b = route[i - 1], route[i]
+            for k in range(i + 1, last + 1):
+                c = route[k]
+                e = route[k + 1] if k + 1 < len(route) else None
+                delta = d[a][c] - d[a][b]
+                if e is not None:
+                    delta += d[b][e] - d[c][e]
+                if delta < -1e-9:
+                    route[i:k + 1] = route[i:k + 1][::-1]
+                    b = route[i]
+                    improved = True
+    return route
+
+
+# -----------------------------
+# Public API
+# -----------------------------
+
+def plan_route(
+    lat: float,
+    lng: float,
+    stops: List[Dict[str, Any]],
+    return_to_start: bool = False,
+) -> Dict[str, Any]:
+    """
+    Order `stops` for the shortest trip from (lat, lng).
+    Returns the ordered stops with leg/cumulative km and the total.
+    """
+    if len(stops) > ROUTE_MAX_STOPS:
+        raise ValueError(f"at most {ROUTE_MAX_STOPS} stops per route")
+    if not stops:
+        return {"stops": [], "total_km": 0.0, "method": "exact"}
+
+    n = len(stops)
+    d = _route_matrix(lat, lng, [_stop_coords(s) for s in stops])
+
+    if n <= ROUTE_EXACT_MAX_STOPS:
+        method = "exact"
+        order = _solve_exact(d, n, return_to_start)
+    else:
+        method = "heuristic"
+        route = [0] + _nearest_neighbor(d, n) + ([0] if return_to_start else [])
+        route = _two_opt(route, d, return_to_start)
+        order = route[1:-1] if return_to_start else route[1:]
+
+    route = [0] + order + ([0] if return_to_start else [])
+    ordered, cumulative, prev = [], 0.0, 0
+    for node in order:
+        leg = d[prev][node]
+        cumulative += leg
+        ordered.append({**stops[node - 1], "leg_km": round(leg, 2), "cumulative_km": round(cumulative, 2)})
+        prev = node
+
+    result: Dict[str, Any] = {
+        "stops": ordered,
+        "total_km": round(_path_length(route, d), 2),
+        "method": method,
+    }
+    if return_to_start:
+        result["return_leg_km"] = round(d[prev][0], 2)
+    return result
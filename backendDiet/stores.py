@@ -1,29 +1,182 @@
 # backend/stores.py
 
 from __future__ import annotations
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import asyncio
+import heapq
 import os
-import requests
-from math import radians, sin, cos, sqrt, atan2
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from dotenv import load_dotenv
-from cache import get as cache_get, set as cache_set
+from cache import (
+    get as cache_get,
+    get_or_load as cache_get_or_load,
+    get_or_load_async as cache_get_or_load_async,
+)
 from logging_config import logger
+import db
+import http_client
+import maps
 
 load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 PLACES_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
 
+# Places cache windows (seconds): fresh for PLACES_TTL_S, then served stale
+# while refreshing in the background until +PLACES_STALE_TTL_S, then kept
+# for +PLACES_STALE_IF_ERROR_S only as a fallback when Google fails.
+PLACES_TTL_S = 1800
+PLACES_STALE_TTL_S = 1800
+PLACES_STALE_IF_ERROR_S = 6 * 3600
+
+# One Nearby Search per entry, run concurrently and merged by place_id.
+# Each search follows next_page_token (20 results per page, 3 pages max);
+# a fresh token is rejected with INVALID_REQUEST for a moment after issue.
+PLACES_SEARCHES: Tuple[Dict[str, str], ...] = (
+    {"type": "supermarket"},
+    {"type": "convenience_store"},
+    {"type": "store", "keyword": "health food"},
+)
+PLACES_MAX_PAGES = 3
+PLACES_PAGE_DELAY_S = 2.0
+PLACES_PAGE_RETRIES = 3
+
+# Cache keys are quantized to a geohash cell sized to a fraction of the
+# search radius, so nearby users share one entry. The search is run from the
+# cell center with the radius widened by the cell's half-diagonal, so the
+# result covers every user circle centered in that cell.
+PLACES_KEY_CELL_FRACTION = 0.1  # key cell side >= 10% of the radius
+PLACES_MAX_RADIUS_M = 50_000    # Nearby Search limit
+PLACES_MAX_CELL_PRECISION = 9   # ~5 m cells; finer than this, search around the user
+
+# Spatial superset lookup: every cached search circle is registered under
+# geohash buckets so a request inside an already cached larger circle can be
+# answered by filtering that result locally.
+PLACES_AREA_MAX = 50_000        # registered circles kept (oldest dropped first)
+
+# Local store index (db.stores + R*Tree): every upstream result is persisted,
+# and find_stores(local_index=True) answers from it when a complete search
+# newer than STORE_INDEX_MAX_AGE_S covers the requested circle.
+STORE_INDEX_MAX_AGE_S = 7 * 24 * 3600
+
 # -----------------------------
-# Distance (Haversine)
+# Cached search areas (spatial superset index)
 # -----------------------------
+# cache_key -> (lat, lng, radius_km, cells). A circle is bucketed under the
+# geohash cell of its center and that cell's 8 neighbors, at the finest
+# precision whose cells are at least as large as the radius. Any point the
+# circle contains then has one of those 9 cells as a geohash prefix.
+#
+# Only complete searches are registered: a search cut off with pages left
+# (next_page_token) is not a true superset of a smaller search.
+
+_AREAS: "OrderedDict[str, Tuple[float, float, float, List[str]]]" = OrderedDict()
+_AREA_CELLS: Dict[str, Dict[str, None]] = {}
+_AREA_LOCK = threading.Lock()
+
+def _unregister_area(cache_key: str) -> None:
+    area = _AREAS.pop(cache_key, None)
+    if area is None:
+        return
+    for cell in area[3]:
+        keys = _AREA_CELLS.get(cell)
+        if keys is not None:
+            keys.pop(cache_key, None)
+            if not keys:
+                del _AREA_CELLS[cell]
+
+def _register_area(cache_key: str, lat: float, lng: float, radius_km: float) -> None:
+    precision = maps.geohash_precision_for_radius(radius_km, lat)
+    center = maps.geohash_encode(lat, lng, precision)
+    cells = [center] + maps.geohash_neighbors(center)
+
+    with _AREA_LOCK:
+        _unregister_area(cache_key)
+        _AREAS[cache_key] = (lat, lng, radius_km, cells)
+        for cell in cells:
+            _AREA_CELLS.setdefault(cell, {})[cache_key] = None
+        while len(_AREAS) > PLACES_AREA_MAX:
+            _unregister_area(next(iter(_AREAS)))
+
+def _covering_results(lat: float, lng: float, radius_km: float, exclude_key: str) -> Optional[List[Dict]]:
+    """
+    Answer a search from any cached circle that fully contains it.
+    Returns the filtered results, or None when no covering entry is cached.
+    """
+    # One full-precision hash; every coarser bucket is one of its prefixes
+    geohash = maps.geohash_encode(lat, lng, maps.GEOHASH_MAX_PRECISION)
+    with _AREA_LOCK:
+        candidates = [
+            (k, _AREAS[k])
+            for p in range(1, maps.GEOHASH_MAX_PRECISION + 1)
+            for k in _AREA_CELLS.get(geohash[:p], {})
+            if k != exclude_key
+        ]
 
-def distance_km(lat1, lng1, lat2, lng2):
-    R = 6371
-    dlat = radians(lat2 - lat1)
-    dlng = radians(lng2 - lng1)
-    a = sin(dlat / 2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlng / 2)**2
-    return R * 2 * atan2(sqrt(a), sqrt(1 - a))
+    # Prefer the tightest covering circle: fewest results to filter
+    covering = sorted(
+        (
+            (area[2], k, area) for k, area in candidates
+            if maps.distance_km(lat, lng, area[0], area[1]) + radius_km <= area[2]
+        ),
+        key=lambda t: t[0],
+    )
+    for _, k, _area in covering:
+        superset = cache_get(k)
+        if superset is None:
+            with _AREA_LOCK:
+                _unregister_area(k)  # cache entry expired or evicted
+            continue
+
+        return _filter_to_circle(superset, lat, lng, radius_km)
+
+    return None
+
+def _filter_to_circle(results: List[Dict], lat: float, lng: float, radius_km: float) -> List[Dict]:
+    min_lat, max_lat, min_lng, max_lng = maps.bounding_box(lat, lng, radius_km)
+    out = []
+    for s in results:
+        loc = s["geometry"]["location"]
+        if not (min_lat <= loc["lat"] <= max_lat and min_lng <= loc["lng"] <= max_lng):
+            continue
+        if maps.within_radius(lat, lng, loc["lat"], loc["lng"], radius_km):
+            out.append(s)
+    return out
+
+def _places_cell(lat: float, lng: float, radius_m: int) -> Tuple[str, float, float, int]:
+    """
+    Quantize a search to its shared cache cell.
+    Returns (cell key, cell_lat, cell_lng, fetch_radius_m); the fetch circle
+    always covers the user's circle.
+    """
+    radius_km = radius_m / 1000
+    precision = maps.geohash_precision_for_radius(radius_km * PLACES_KEY_CELL_FRACTION, lat)
+    while True:
+        cell = maps.geohash_encode(lat, lng, precision)
+        cell_lat, cell_lng = maps.geohash_decode(cell)
+        min_lat, max_lat, min_lng, max_lng = maps.geohash_bounds(cell)
+        half_diag_km = max(
+            maps.distance_km(cell_lat, cell_lng, a, b)
+            for a in (min_lat, max_lat) for b in (min_lng, max_lng)
+        )
+        fetch_radius_m = radius_m + int(half_diag_km * 1000) + 1
+        # Cells stretch at high latitudes: refine until the padded search fits
+        if fetch_radius_m <= PLACES_MAX_RADIUS_M and half_diag_km <= radius_km:
+            return cell, cell_lat, cell_lng, fetch_radius_m
+        if precision >= PLACES_MAX_CELL_PRECISION:
+            break
+        precision += 1
+
+    # No cell leaves room for the padding: search around the user (rounded
+    # to ~1 m so nearby requests still share a key)
+    pt_lat, pt_lng = round(lat, 5), round(lng, 5)
+    return f"pt{pt_lat},{pt_lng}", pt_lat, pt_lng, min(PLACES_MAX_RADIUS_M, radius_m + 2)
 
 # -----------------------------
 # Google Places Fetch
@@ -34,27 +187,461 @@ def fetch_nearby_stores(
     lng: float,
     radius_m: int = 5000,
 ) -> List[Dict]:
-    cache_key = f"places:{round(lat,4)}:{round(lng,4)}:{radius_m}"
-    cached = cache_get(cache_key)
-    if cached:
-        logger.info("Google Places cache hit")
-        return cached
+    cell, cell_lat, cell_lng, fetch_radius_m = _places_cell(lat, lng, radius_m)
+    cache_key = f"places:{cell}:{radius_m}"
 
-    logger.info("Google Places cache miss")
-    params = {
+    superset = _covering_results(lat, lng, radius_m / 1000, exclude_key=cache_key)
+    if superset is not None:
+        logger.info("Google Places superset cache hit")
+        return superset
+
+    def load() -> List[Dict]:
+        results, complete = _request_places(cell_lat, cell_lng, fetch_radius_m)
+        _record_places(cache_key, results, cell_lat, cell_lng, fetch_radius_m / 1000, complete)
+        return results
+
+    # Concurrent misses on the same key share one upstream request
+    cell_results = cache_get_or_load(
+        cache_key,
+        load,
+        ttl_seconds=PLACES_TTL_S,
+        persist=True,  # survives restarts via the L2 tier
+        stale_ttl_seconds=PLACES_STALE_TTL_S,
+        stale_if_error_seconds=PLACES_STALE_IF_ERROR_S,
+    )
+    # The cell search is centered elsewhere and slightly wider: trim to this user
+    return _filter_to_circle(cell_results, lat, lng, radius_m / 1000)
+
+async def fetch_nearby_stores_async(
+    lat: float,
+    lng: float,
+    radius_m: int = 5000,
+) -> List[Dict]:
+    """
+    Coroutine version of fetch_nearby_stores for async endpoints: the
+    upstream call and index write never hold a worker thread while waiting.
+    """
+    cell, cell_lat, cell_lng, fetch_radius_m = _places_cell(lat, lng, radius_m)
+    cache_key = f"places:{cell}:{radius_m}"
+
+    superset = _covering_results(lat, lng, radius_m / 1000, exclude_key=cache_key)
+    if superset is not None:
+        logger.info("Google Places superset cache hit")
+        return superset
+
+    cell_results = await _cell_places_async(cache_key, cell_lat, cell_lng, fetch_radius_m)
+    return _filter_to_circle(cell_results, lat, lng, radius_m / 1000)
+
+class _PlacesFeed:
+    """
+    Pages of one in-flight async Places fetch, replayable by late
+    followers. Registered under the cache key, so streams for a cell follow
+    the single-flight load instead of paging Google themselves.
+    """
+
+    def __init__(self) -> None:
+        self.pages: List[List[Dict]] = []
+        self.loading = False  # claimed by a loader (not just offered by a stream)
+        self.done = False
+        self._changed = asyncio.Event()
+
+    def wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self) -> None:
+        # Until the next publish/close/wake after this call
+        await self._changed.wait()
+
+    def publish(self, page: List[Dict]) -> None:
+        self.pages.append(page)
+        self.wake()
+
+    def close(self) -> None:
+        self.done = True
+        self.wake()
+
+_PLACES_FEEDS: Dict[str, _PlacesFeed] = {}
+
+def _cell_places_async(cache_key: str, cell_lat: float, cell_lng: float, fetch_radius_m: int) -> Awaitable[List[Dict]]:
+    """
+    The cell's Places results through the async cache: single-flight per
+    key, stale-while-revalidate and stale-if-error. The loader publishes
+    each page to the key's _PlacesFeed as it arrives.
+    """
+    async def load() -> List[Dict]:
+        feed = _PLACES_FEEDS.setdefault(cache_key, _PlacesFeed())
+        feed.loading = True
+        try:
+            results, complete = await _request_places_async(cell_lat, cell_lng, fetch_radius_m, feed.publish)
+            await asyncio.to_thread(
+                _record_places, cache_key, results, cell_lat, cell_lng, fetch_radius_m / 1000, complete
+            )
+            return results
+        finally:
+            feed.close()
+            if _PLACES_FEEDS.get(cache_key) is feed:
+                del _PLACES_FEEDS[cache_key]
+
+    return cache_get_or_load_async(
+        cache_key,
+        load,
+        ttl_seconds=PLACES_TTL_S,
+        persist=True,
+        stale_ttl_seconds=PLACES_STALE_TTL_S,
+        stale_if_error_seconds=PLACES_STALE_IF_ERROR_S,
+    )
+
+def _record_places(
+    cache_key: str,
+    results: List[Dict],
+    lat: float,
+    lng: float,
+    radius_km: float,
+    complete: bool,
+) -> None:
+    if complete:
+        _register_area(cache_key, lat, lng, radius_km)
+    _index_places(results, lat, lng, radius_km, complete)
+
+def _places_params(
+    lat: float,
+    lng: float,
+    radius_m: int,
+    search: Dict[str, str],
+    page_token: Optional[str] = None,
+) -> Dict[str, Any]:
+    if page_token:
+        # Follow-up pages are addressed by the token alone
+        return {"key": GOOGLE_API_KEY, "pagetoken": page_token}
+    return {
         "key": GOOGLE_API_KEY,
         "location": f"{lat},{lng}",
         "radius": radius_m,
-        "type": "grocery_or_supermarket",
+        **search,
     }
 
-    resp = requests.get(PLACES_URL, params=params, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+def _merge_places(pages: Iterable[List[Dict]]) -> List[Dict]:
+    # The same store shows up under several types; keep the first copy
+    merged: Dict[str, Dict] = {}
+    for page in pages:
+        for s in page:
+            merged.setdefault(s["place_id"], s)
+    return list(merged.values())
 
-    results = data.get("results", [])
-    cache_set(cache_key, results, ttl_seconds=1800)  # 30 min cache
-    return results
+def _request_places(lat: float, lng: float, radius_m: int) -> Tuple[List[Dict], bool]:
+    """
+    All PLACES_SEARCHES in parallel, merged. Returns (results, complete)
+    where complete is False when any search stopped with pages left.
+    """
+    logger.info("Google Places cache miss")
+    with ThreadPoolExecutor(max_workers=len(PLACES_SEARCHES)) as pool:
+        outcomes = list(pool.map(lambda search: _search_places(lat, lng, radius_m, search), PLACES_SEARCHES))
+    return _merge_places(r for r, _ in outcomes), all(c for _, c in outcomes)
+
+def _search_places(lat: float, lng: float, radius_m: int, search: Dict[str, str]) -> Tuple[List[Dict], bool]:
+    results: List[Dict] = []
+    token = None
+    for _ in range(PLACES_MAX_PAGES):
+        params = _places_params(lat, lng, radius_m, search, token)
+        for _attempt in range(PLACES_PAGE_RETRIES + 1 if token else 1):
+            if token:
+                time.sleep(PLACES_PAGE_DELAY_S)
+            # Shared keep-alive pool with (connect, read) timeouts
+            resp = http_client.get(PLACES_URL, params=params)
+            resp.raise_for_status()
+            data = resp.json()
+            if data.get("status") != "INVALID_REQUEST":
+                break
+        page, token = _parse_places(data)
+        results.extend(page)
+        if not token:
+            return results, True
+    return results, False
+
+async def _request_places_async(
+    lat: float,
+    lng: float,
+    radius_m: int,
+    on_page: Optional[Callable[[List[Dict]], None]] = None,
+) -> Tuple[List[Dict], bool]:
+    logger.info("Google Places cache miss")
+    pages: List[List[Dict]] = []
+    more: Dict[int, bool] = {}
+    async for i, page, has_more in _stream_places(lat, lng, radius_m):
+        pages.append(page)
+        more[i] = has_more
+        if on_page is not None:
+            on_page(page)
+    return _merge_places(pages), not any(more.values())
+
+async def _search_places_async(
+    lat: float,
+    lng: float,
+    radius_m: int,
+    search: Dict[str, str],
+) -> AsyncIterator[Tuple[List[Dict], bool]]:
+    """
+    Yields (page, has_more) for one search as each page arrives.
+    """
+    token = None
+    for page_no in range(PLACES_MAX_PAGES):
+        params = _places_params(lat, lng, radius_m, search, token)
+        for _attempt in range(PLACES_PAGE_RETRIES + 1 if token else 1):
+            if token:
+                await asyncio.sleep(PLACES_PAGE_DELAY_S)
+            resp = await http_client.aget(PLACES_URL, params=params)
+            resp.raise_for_status()
+            data = resp.json()
+            if data.get("status") != "INVALID_REQUEST":
+                break
+        page, token = _parse_places(data)
+        yield page, bool(token) and page_no + 1 == PLACES_MAX_PAGES
+        if not token:
+            return
+
+async def _stream_places(lat: float, lng: float, radius_m: int) -> AsyncIterator[Tuple[int, List[Dict], bool]]:
+    """
+    Run every PLACES_SEARCHES entry concurrently and yield
+    (search_index, page, has_more) in arrival order. has_more is True only on
+    a search's last page when it was cut off at PLACES_MAX_PAGES.
+    Re-raises the first search error once the others have finished.
+    """
+    queue: "asyncio.Queue[Tuple[int, Any, bool]]" = asyncio.Queue()
+    done = object()
+
+    async def pump(i: int, search: Dict[str, str]) -> None:
+        try:
+            async for page, has_more in _search_places_async(lat, lng, radius_m, search):
+                await queue.put((i, page, has_more))
+        except Exception as e:
+            await queue.put((i, e, False))
+        finally:
+            await queue.put((i, done, False))
+
+    tasks = [asyncio.create_task(pump(i, search)) for i, search in enumerate(PLACES_SEARCHES)]
+    error: Optional[Exception] = None
+    try:
+        pending = len(tasks)
+        while pending:
+            i, item, has_more = await queue.get()
+            if item is done:
+                pending -= 1
+            elif isinstance(item, Exception):
+                error = error or item
+            else:
+                yield i, item, has_more
+    finally:
+        # Consumer went away (client disconnect): stop paging
+        for t in tasks:
+            t.cancel()
+    if error is not None:
+        raise error
+
+def _parse_places(data: Dict) -> Tuple[List[Dict], Optional[str]]:
+    # Quota/denied errors come back as HTTP 200; raise so they are neither
+    # cached nor allowed to replace a stale-but-good entry
+    status = data.get("status", "OK")
+    if status not in {"OK", "ZERO_RESULTS"}:
+        raise RuntimeError(f"Google Places error: {status}")
+
+    return data.get("results", []), data.get("next_page_token")
+
+# -----------------------------
+# Local store index (SQLite R*Tree)
+# -----------------------------
+
+def _index_places(results: List[Dict], lat: float, lng: float, radius_km: float, complete: bool) -> None:
+    # Best-effort: the index only saves upstream calls, never fail a request on it
+    try:
+        # One timestamp for both, so the search can tell which stores it returned
+        now = time.time()
+        db.upsert_stores(results, searched_at=now)
+        if complete:
+            db.record_store_search(lat, lng, radius_km, searched_at=now, retain_seconds=STORE_INDEX_MAX_AGE_S)
+    except sqlite3.Error as e:
+        logger.warning(f"store index write failed: {e}")
+
+def local_nearby_stores(lat: float, lng: float, radius_km: float) -> Optional[List[Dict]]:
+    """
+    Raw Places results for the circle from the local index, or None if the
+    area has not been fully searched within STORE_INDEX_MAX_AGE_S.
+    """
+    try:
+        searched_at = db.fresh_store_search_at(lat, lng, radius_km, STORE_INDEX_MAX_AGE_S)
+        if searched_at is None:
+            return None
+        return db.stores_within(lat, lng, radius_km, since=searched_at)
+    except sqlite3.Error as e:
+        logger.warning(f"store index read failed: {e}")
+        return None
+
+# -----------------------------
+# Ingredient availability index
+# -----------------------------
+# Google gives no inventory, so availability is modeled per store category:
+# each ingredient is mapped to an aisle by keyword (whole words, longest
+# keyword first), and each category carries a set of aisles. The known
+# ingredient vocabulary (the meal catalog's) is interned to integer IDs and
+# every category keeps a Python int bitset of the IDs it carries. Names
+# outside that vocabulary get request-local bits and are classified per
+# request, so client input never grows the shared tables.
+
+INGREDIENT_AISLES: Dict[str, Tuple[str, ...]] = {
+    "produce": (
+        "banana", "apple", "berry", "blueberry", "strawberry", "raspberry", "lemon", "lime", "avocado", "spinach", "lettuce",
+        "kale", "broccoli", "carrot", "pepper", "onion", "garlic", "tomato",
+        "potato", "cucumber", "mushroom", "zucchini", "eggplant",
+    ),
+    "meat_seafood": (
+        "chicken", "beef", "turkey", "pork", "bacon", "ham", "lamb",
+        "fish", "salmon", "tuna", "shrimp",
+    ),
+    "dairy_eggs": ("egg", "milk", "cheese", "parmesan", "yogurt", "butter", "cream"),
+    "bakery": ("bread", "toast", "bagel", "tortilla", "pita", "bun"),
+    "plant_protein": ("tofu", "tempeh", "seitan", "edamame", "lentil", "chickpea", "quinoa"),
+    "pantry": (
+        "oats", "rice", "pasta", "bean", "peanut butter", "salsa", "marinara",
+        "sauce", "oil", "spice", "cinnamon", "salt", "flour", "sugar", "honey",
+        "nut", "peanut", "almond", "walnut", "cereal", "broth", "cracker",
+        "black pepper", "white pepper", "peppercorn",
+    ),
+}
+OTHER_AISLE = "specialty"  # no keyword matched
+
+STORE_CATEGORY_AISLES: Dict[str, Tuple[str, ...]] = {
+    "supermarket": ("produce", "meat_seafood", "dairy_eggs", "bakery", "plant_protein", "pantry"),
+    "supermarket_premium": (
+        "produce", "meat_seafood", "dairy_eggs", "bakery", "plant_protein", "pantry", OTHER_AISLE,
+    ),
+    "health_food": ("produce", "dairy_eggs", "bakery", "plant_protein", "pantry", OTHER_AISLE),
+    "convenience": ("dairy_eggs", "bakery", "pantry"),
+}
+
+# Name hints for stores without a meat counter (full-line grocers such as
+# Whole Foods are supermarkets, classified by price level)
+_HEALTH_FOOD_HINTS = ("health", "natural", "organic", "co-op", "vitamin")
+
+# Interned IDs stay below this; request-local bits start at it
+INGREDIENT_INTERN_MAX = int(os.getenv("INGREDIENT_INTERN_MAX", "8192"))
+
+_WORD = re.compile(r"[a-z]+")
+
+def _word_forms(word: str) -> Tuple[str, ...]:
+    # Singular and plural spellings a keyword's last word may take
+    forms = (word, word + "s", word + "es")
+    return forms + (word[:-1] + "ies",) if word.endswith("y") else forms
+
+# (keyword words, accepted forms of the last word, aisle); longest keyword
+# first, so "peanut butter" wins over "butter" and "black pepper" over "pepper"
+_AISLE_KEYWORDS = sorted(
+    (
+        (tuple(kw.split()), _word_forms(kw.split()[-1]), aisle)
+        for aisle, kws in INGREDIENT_AISLES.items() for kw in kws
+    ),
+    key=lambda t: len(" ".join(t[0])),
+    reverse=True,
+)
+
+_INGREDIENT_IDS: Dict[str, int] = {}
+_INGREDIENT_NAMES: List[str] = []
+_CATEGORY_MASKS: Dict[str, int] = {c: 0 for c in STORE_CATEGORY_AISLES}
+_INGREDIENT_LOCK = threading.Lock()
+
+def _ingredient_aisle(name: str) -> str:
+    words = _WORD.findall(name.lower())
+    for kw, last_forms, aisle in _AISLE_KEYWORDS:
+        n = len(kw)
+        for i in range(len(words) - n + 1):
+            if words[i + n - 1] in last_forms and tuple(words[i:i + n - 1]) == kw[:-1]:
+                return aisle
+    return OTHER_AISLE
+
+def _aisle_categories(aisle: str) -> List[str]:
+    return [c for c, aisles in STORE_CATEGORY_AISLES.items() if aisle in aisles]
+
+def register_ingredients(names: Iterable[str]) -> None:
+    """
+    Intern a known ingredient vocabulary (the meal catalog's). Each name is
+    classified once and its bit set in every category carrying its aisle;
+    at most INGREDIENT_INTERN_MAX names are kept.
+    """
+    with _INGREDIENT_LOCK:
+        for raw in names:
+            name = str(raw).strip().lower()
+            if not name or name in _INGREDIENT_IDS or len(_INGREDIENT_NAMES) >= INGREDIENT_INTERN_MAX:
+                continue
+            ing_id = len(_INGREDIENT_NAMES)
+            for category in _aisle_categories(_ingredient_aisle(name)):
+                _CATEGORY_MASKS[category] |= 1 << ing_id
+            _INGREDIENT_NAMES.append(name)
+            _INGREDIENT_IDS[name] = ing_id
+
+class IngredientSet(NamedTuple):
+    """
+    Needed ingredients as one bitset: interned IDs, plus request-local bits
+    from INGREDIENT_INTERN_MAX up for names outside the vocabulary.
+    """
+    mask: int
+    local_names: Tuple[str, ...] = ()
+    local_masks: Dict[str, int] = {}  # category -> local bits it carries
+
+    def available(self, category: str) -> int:
+        return self.mask & (_CATEGORY_MASKS.get(category, 0) | self.local_masks.get(category, 0))
+
+    def names(self, mask: int) -> List[str]:
+        names = []
+        while mask:
+            low = mask & -mask
+            bit = low.bit_length() - 1
+            names.append(_INGREDIENT_NAMES[bit] if bit < INGREDIENT_INTERN_MAX else self.local_names[bit - INGREDIENT_INTERN_MAX])
+            mask ^= low
+        return names
+
+def ingredient_set(meals: Optional[List[Dict]]) -> IngredientSet:
+    """
+    Every ingredient the meals need.
+    """
+    mask = 0
+    local: Dict[str, int] = {}
+    local_masks: Dict[str, int] = {}
+    for m in meals or []:
+        for ing in m.get("ingredients", []):
+            name = str(ing).strip().lower()
+            if not name:
+                continue
+            ing_id = _INGREDIENT_IDS.get(name)
+            if ing_id is None:
+                ing_id = local.get(name)
+                if ing_id is None:
+                    ing_id = local[name] = INGREDIENT_INTERN_MAX + len(local)
+                    for category in _aisle_categories(_ingredient_aisle(name)):
+                        local_masks[category] = local_masks.get(category, 0) | 1 << ing_id
+            mask |= 1 << ing_id
+    return IngredientSet(mask, tuple(local), local_masks)
+
+def store_category(types: Optional[List[str]], name: Optional[str], price_level: int) -> str:
+    """
+    Availability category for a Places result (types, name, 0–4 price level).
+    """
+    types = types or []
+    name = (name or "").lower()
+    if "health" in types or any(h in name for h in _HEALTH_FOOD_HINTS):
+        return "health_food"
+    if "convenience_store" in types and "supermarket" not in types:
+        return "convenience"
+    return "supermarket_premium" if price_level >= 3 else "supermarket"
+
+def ingredient_coverage(needed: IngredientSet, category: str) -> Tuple[float, int]:
+    """
+    (coverage percent, missing bitset) of the needed ingredients at a store
+    category. No ingredients needed means full coverage.
+    """
+    if not needed.mask:
+        return 100.0, 0
+    available = needed.available(category)
+    coverage = bin(available).count("1") / bin(needed.mask).count("1")
+    return round(coverage * 100, 1), needed.mask & ~available
 
 # -----------------------------
 # Store Intelligence Layer
@@ -66,48 +653,154 @@ def find_stores(
     meals: Optional[List[Dict]] = None,
     user_profile: Optional[Dict] = None,
     radius_km: float = 5.0,
+    local_index: bool = False,
+    limit: Optional[int] = None,
+    min_score: Optional[float] = None,
 ) -> List[Dict]:
     logger.info(f"find_stores called lat={lat}, lng={lng}, radius_km={radius_km}")
     """
     Main store discovery function.
+    local_index=True answers from the local store index when the area was
+    searched recently, and only goes to Google for unseen or stale areas.
+    limit/min_score keep only the best `limit` stores scoring at least
+    min_score (best first); only those get a full response entry.
     """
-    raw_stores = fetch_nearby_stores(lat, lng, int(radius_km * 1000))
-    results = []
+    raw_stores = local_nearby_stores(lat, lng, radius_km) if local_index else None
+    if raw_stores is None:
+        raw_stores = fetch_nearby_stores(lat, lng, int(radius_km * 1000))
+    return _score_stores(raw_stores, lat, lng, meals, user_profile, limit, min_score)
 
-    needed_ingredients = set()
-    if meals:
-        for m in meals:
-            for ing in m.get("ingredients", []):
-                needed_ingredients.add(ing.lower())
+async def find_stores_async(
+    lat: float,
+    lng: float,
+    meals: Optional[List[Dict]] = None,
+    user_profile: Optional[Dict] = None,
+    radius_km: float = 5.0,
+    local_index: bool = False,
+    limit: Optional[int] = None,
+    min_score: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Coroutine version of find_stores (same arguments and output).
+    """
+    logger.info(f"find_stores_async called lat={lat}, lng={lng}, radius_km={radius_km}")
+    raw_stores = None
+    if local_index:
+        raw_stores = await asyncio.to_thread(local_nearby_stores, lat, lng, radius_km)
+    if raw_stores is None:
+        raw_stores = await fetch_nearby_stores_async(lat, lng, int(radius_km * 1000))
+    return _score_stores(raw_stores, lat, lng, meals, user_profile, limit, min_score)
 
-    budget = _normalize_budget(user_profile or {})
+async def stream_stores(
+    lat: float,
+    lng: float,
+    meals: Optional[List[Dict]] = None,
+    user_profile: Optional[Dict] = None,
+    radius_km: float = 5.0,
+    min_score: Optional[float] = None,
+) -> AsyncIterator[List[Dict]]:
+    """
+    find_stores_async, but yields scored batches as Places pages arrive
+    (each store once across pages and place types). The fetch is the same
+    cached single-flight load as find_stores_async: while one is in flight
+    for the cell, its pages are streamed; whatever the load finally returns
+    (fresh, stale or stale-if-error) tops up the stream at the end.
+    """
+    radius_m = int(radius_km * 1000)
+    cell, cell_lat, cell_lng, fetch_radius_m = _places_cell(lat, lng, radius_m)
+    cache_key = f"places:{cell}:{radius_m}"
 
-    for s in raw_stores:
-        store_lat = s["geometry"]["location"]["lat"]
-        store_lng = s["geometry"]["location"]["lng"]
-        dist = distance_km(lat, lng, store_lat, store_lng)
+    cached = _covering_results(lat, lng, radius_km, exclude_key=cache_key)
+    if cached is not None:
+        yield _score_stores(cached, lat, lng, meals, user_profile, min_score=min_score)
+        return
 
-        price_level = s.get("price_level", 2)  # 0–4 Google scale
+    # Follow the key's in-flight load, or offer a feed for the load we may start
+    feed = _PLACES_FEEDS.setdefault(cache_key, _PlacesFeed())
+    fetch = asyncio.ensure_future(_cell_places_async(cache_key, cell_lat, cell_lng, fetch_radius_m))
+    fetch.add_done_callback(lambda _: feed.wake())
+    seen: Dict[str, Dict] = {}
 
-        budget_match = (
-            (budget == "low" and price_level <= 1) or
-            (budget == "medium" and price_level <= 2) or
-            (budget == "high")
+    def batch(stores: List[Dict]) -> List[Dict]:
+        fresh = [st for st in stores if st["place_id"] not in seen]
+        for st in fresh:
+            seen[st["place_id"]] = st
+        return _score_stores(
+            _filter_to_circle(fresh, lat, lng, radius_km), lat, lng, meals, user_profile, min_score=min_score
         )
 
-        # Ingredient coverage is estimated (Google doesn’t give inventory)
-        coverage = estimate_ingredient_coverage(needed_ingredients, price_level)
+    try:
+        followed = 0
+        while True:
+            while followed < len(feed.pages):
+                scored = batch(feed.pages[followed])
+                followed += 1
+                if scored:
+                    yield scored
+            if feed.done or fetch.done():
+                break
+            await feed.wait()
 
-        score = compute_store_score(
-            distance_km=dist,
-            coverage=coverage,
-            price_level=price_level,
-            budget_match=budget_match
-        )
+        scored = batch(await fetch)
+        if scored or not seen:
+            yield scored
+    finally:
+        if not fetch.done():
+            fetch.cancel()  # the shared load itself is shielded in the cache
+        if not feed.loading and _PLACES_FEEDS.get(cache_key) is feed:
+            del _PLACES_FEEDS[cache_key]
+
+def _score_stores(
+    raw_stores: List[Dict],
+    lat: float,
+    lng: float,
+    meals: Optional[List[Dict]],
+    user_profile: Optional[Dict],
+    limit: Optional[int] = None,
+    min_score: Optional[float] = None,
+) -> List[Dict]:
+    results = []
+
+    needed = ingredient_set(meals)
+
+    budget = _normalize_budget(user_profile or {})
+
+    # Score every store with a few array operations instead of a per-store loop
+    price_levels = [s.get("price_level", 2) for s in raw_stores]  # 0–4 Google scale
+    dists = maps.distance_km_batch(
+        lat,
+        lng,
+        [s["geometry"]["location"]["lat"] for s in raw_stores],
+        [s["geometry"]["location"]["lng"] for s in raw_stores],
+    )
+    budget_matches = [_budget_match(budget, p) for p in price_levels]
+    # Coverage from the availability index: one AND per store
+    categories = [store_category(s.get("types"), s.get("name"), p) for s, p in zip(raw_stores, price_levels)]
+    coverages, missing = zip(*(ingredient_coverage(needed, c) for c in categories)) if raw_stores else ((), ())
+    scores = compute_store_scores(dists, coverages, price_levels, budget_matches).tolist()
 
+    # Pick the winners on the bare scores; dicts and explanations are only
+    # built for stores that are returned. nlargest matches a stable
+    # descending sort, so ties keep Places order as before.
+    candidates = range(len(raw_stores))
+    if min_score is not None:
+        candidates = [i for i in candidates if scores[i] >= min_score]
+    if limit is not None:
+        selected = heapq.nlargest(max(limit, 0), candidates, key=scores.__getitem__)
+    else:
+        selected = sorted(candidates, key=scores.__getitem__, reverse=True)
+
+    for i in selected:
+        s = raw_stores[i]
+        dist = float(dists[i])
+        score = float(scores[i])
+        price_level = price_levels[i]
+        budget_match = budget_matches[i]
+        coverage = coverages[i]
         results.append({
             "place_id": s["place_id"],
             "name": s["name"],
+            "category": categories[i],
             "location": s["geometry"]["location"],
             "distance_km": round(dist, 2),
             "rating": s.get("rating"),
@@ -116,25 +809,157 @@ def find_stores(
             "open_now": s.get("opening_hours", {}).get("open_now"),
             "budget_match": budget_match,
             "ingredient_coverage_percent": coverage,
+            "missing_ingredients": needed.names(missing[i]),
             "meal_plan_support_score": score,
             "why_recommended": explain_store_choice(dist, coverage, price_level),
         })
 
-    return sorted(results, key=lambda x: x["meal_plan_support_score"], reverse=True)
+    return results
 
-# -----------------------------
-# Your Unique Scoring Logic
-# -----------------------------
+# Relative basket cost by Google price level (2 = typical supermarket)
+PRICE_LEVEL_COST_FACTOR = {0: 0.85, 1: 0.92, 2: 1.0, 3: 1.15, 4: 1.3}
+
+def _meal_plan_cost(meals: Optional[List[Dict]]) -> Optional[float]:
+    costs = [m.get("cost_estimate") for m in meals or []]
+    costs = [c for c in costs if isinstance(c, (int, float))]
+    return sum(costs) if costs else None
 
-def estimate_ingredient_coverage(ingredients: set, price_level: int) -> float:
+def store_score(store: Dict, meals: List[Dict], user_profile: Dict) -> Dict:
     """
-    Heuristic: higher-end stores usually have broader inventory.
+    Score one store (as returned by /stores) against a meal plan.
     """
-    if not ingredients:
-        return 100.0
+    price_level = store.get("price_level", 2)
+    category = store.get("category") or store_category(store.get("types"), store.get("name"), price_level)
+    needed = ingredient_set(meals)
+    coverage, missing = ingredient_coverage(needed, category)
+    budget_match = _budget_match(_normalize_budget(user_profile or {}), price_level)
+    dist = store.get("distance_km") or 0.0
 
-    base = {0: 0.6, 1: 0.7, 2: 0.8, 3: 0.9, 4: 0.95}.get(price_level, 0.75)
-    return round(base * 100, 1)
+    return {
+        "place_id": store.get("place_id"),
+        "name": store.get("name"),
+        "category": category,
+        "ingredient_coverage_percent": coverage,
+        "missing_ingredients": needed.names(missing),
+        "budget_match": budget_match,
+        "meal_plan_support_score": compute_store_score(dist, coverage, price_level, budget_match),
+        "why_recommended": explain_store_choice(dist, coverage, price_level),
+    }
+
+def cheapest_store(
+    meals: List[Dict],
+    user_profile: Dict,
+    lat: float,
+    lng: float,
+    radius_km: float = 5.0,
+) -> Dict:
+    """
+    Cheapest nearby store that still stocks the most of the meal plan:
+    best coverage first, then lowest price level, then distance.
+    """
+    candidates = find_stores(lat, lng, meals, user_profile, radius_km)
+    if not candidates:
+        return {"store": None, "estimated_basket_cost": None, "alternatives": [], "reason": "No stores found nearby"}
+
+    ranked = sorted(
+        candidates,
+        key=lambda s: (-s["ingredient_coverage_percent"], s["price_level"], s["distance_km"]),
+    )
+    best = ranked[0]
+    base_cost = _meal_plan_cost(meals)
+    est_cost = (
+        round(base_cost * PRICE_LEVEL_COST_FACTOR.get(best["price_level"], 1.0), 2)
+        if base_cost is not None else None
+    )
+
+    reason = f"Lowest price level among stores with {best['ingredient_coverage_percent']}% ingredient coverage"
+    if best["missing_ingredients"]:
+        reason += f" (missing: {', '.join(best['missing_ingredients'])})"
+
+    return {
+        "store": best,
+        "estimated_basket_cost": est_cost,
+        "alternatives": ranked[1:4],
+        "reason": reason,
+    }
+
+def store_meal_match(store: Dict, meals: List[Dict]) -> Dict:
+    """
+    Per-meal ingredient availability at one store.
+    """
+    price_level = store.get("price_level", 2)
+    category = store.get("category") or store_category(store.get("types"), store.get("name"), price_level)
+
+    per_meal = []
+    for m in meals or []:
+        meal_needed = ingredient_set([m])
+        coverage, missing = ingredient_coverage(meal_needed, category)
+        per_meal.append({
+            "name": m.get("name"),
+            "ingredient_coverage_percent": coverage,
+            "missing_ingredients": meal_needed.names(missing),
+            "fully_supported": not missing,
+        })
+
+    needed = ingredient_set(meals)
+    coverage, missing = ingredient_coverage(needed, category)
+    return {
+        "place_id": store.get("place_id"),
+        "name": store.get("name"),
+        "category": category,
+        "ingredient_coverage_percent": coverage,
+        "missing_ingredients": needed.names(missing),
+        "meals": per_meal,
+        "fully_supported_meals": [m["name"] for m in per_meal if m["fully_supported"]],
+    }
+
+def cover_stores(
+    lat: float,
+    lng: float,
+    ingredients: List[str],
+    user_profile: Optional[Dict] = None,
+    radius_km: float = 5.0,
+) -> Dict:
+    """
+    Small set of nearby stores that together stock every ingredient.
+    Greedy set cover on ingredient bitsets: repeatedly take the store that
+    covers the most still-uncovered items (closer, then cheaper, on ties).
+    """
+    plan = [{"ingredients": ingredients}]
+    needed = ingredient_set(plan)
+    candidates = find_stores(lat, lng, plan, user_profile, radius_km)
+
+    # Stores of one category stock the same items; each pick is one AND per store
+    masks = [needed.available(c["category"]) for c in candidates]
+    uncovered = needed.mask
+    picked: List[Dict] = []
+    while uncovered:
+        best_i, best_key = -1, None
+        for i, mask in enumerate(masks):
+            gain = bin(mask & uncovered).count("1")
+            if not gain:
+                continue
+            key = (gain, -candidates[i]["distance_km"], -candidates[i]["price_level"])
+            if best_key is None or key > best_key:
+                best_i, best_key = i, key
+        if best_i < 0:
+            break  # nothing nearby stocks the rest
+
+        covers = masks[best_i] & uncovered
+        uncovered &= ~covers
+        picked.append({**candidates[best_i], "covers": needed.names(covers)})
+        masks[best_i] = 0
+
+    return {
+        "stores": picked,
+        "store_count": len(picked),
+        "ingredient_count": bin(needed.mask).count("1"),
+        "uncovered_ingredients": needed.names(uncovered),
+    }
+
+# -----------------------------
+# Your Unique Scoring Logic
+# -----------------------------
 
 def compute_store_score(
     distance_km: float,
@@ -159,6 +984,29 @@ def compute_store_score(
 
     return round(min(score, 100.0), 1)
 
+def compute_store_scores(
+    distances,
+    coverages,
+    price_levels,
+    budget_matches,
+):
+    """
+    Batch version of compute_store_score over parallel sequences.
+    Returns a float64 NumPy array.
+    """
+    d = np.asarray(distances, dtype=np.float64)
+    c = np.asarray(coverages, dtype=np.float64)
+    p = np.asarray(price_levels, dtype=np.float64)
+    b = np.asarray(budget_matches, dtype=bool)
+
+    score = (
+        c * 0.5                                           # Coverage (0–50)
+        + np.maximum(0, 25 - d * 3)                       # Distance (0–25)
+        + np.where(b, 15.0, 0.0)                          # Budget alignment (0–15)
+        + np.maximum(0, 10 - np.abs(p - 2) * 3)           # Price sanity (0–10)
+    )
+    return np.round(np.minimum(score, 100.0), 1)
+
 def explain_store_choice(distance_km, coverage, price_level):
     reasons = []
     if coverage > 80:
@@ -169,6 +1017,13 @@ def explain_store_choice(distance_km, coverage, price_level):
         reasons.append("Budget-friendly pricing")
     return "; ".join(reasons)
 
+def _budget_match(budget: str, price_level: int) -> bool:
+    return (
+        (budget == "low" and price_level <= 1) or
+        (budget == "medium" and price_level <= 2) or
+        (budget == "high")
+    )
+
 def _normalize_budget(profile: Dict) -> str:
     income = profile.get("income")
     if isinstance(income, (int, float)):
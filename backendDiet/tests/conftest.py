@@ -0,0 +1,12 @@
+# backend/tests/conftest.py
+"""
+Backend modules are flat files in backendDiet/; make them importable.
+
+Run from backendDiet/:
+    python -m pytest -q tests
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,36 @@
+# backend/tests/test_ai.py
+
+import time
+
+import ai
+
+PROFILE = {"user_id": "u1", "age": 30, "gender": "male", "weight_kg": 80, "height_cm": 180, "goal": "maintain", "budget": "medium"}
+
+
+def test_batched_timeout_goes_straight_to_meal_db(monkeypatch):
+    per_day_calls = []
+
+    def slow_batch(profile, n_days, timeout=None):
+        time.sleep(0.2)  # runs out the whole budget
+        return None
+
+    monkeypatch.setattr(ai, "_HAS_OPENAI", True)
+    monkeypatch.setattr(ai, "_openai_generate_days", slow_batch)
+    monkeypatch.setattr(ai, "_openai_generate_meal_ideas", lambda *a, **kw: per_day_calls.append(1))
+
+    week = ai.generate_weekly_meal_plan(PROFILE, mode="batched", deadline_s=0.2)
+    assert per_day_calls == []
+    assert [d["day"] for d in week] == list(range(1, 8))
+    assert all(d["fallback"] == "deadline" and len(d["meals"]) == 3 for d in week)
+
+
+def test_batched_failure_with_time_left_runs_per_day_calls(monkeypatch):
+    per_day_calls = []
+
+    monkeypatch.setattr(ai, "_HAS_OPENAI", True)
+    monkeypatch.setattr(ai, "_openai_generate_days", lambda *a, **kw: None)
+    monkeypatch.setattr(ai, "_openai_generate_meal_ideas", lambda *a, **kw: per_day_calls.append(1))
+
+    week = ai.generate_weekly_meal_plan(PROFILE, mode="batched", deadline_s=30)
+    assert len(per_day_calls) == 7
+    assert all("fallback" not in d and len(d["meals"]) == 3 for d in week)
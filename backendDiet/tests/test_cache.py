@@ -0,0 +1,154 @@
+# backend/tests/test_cache.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import cache
+
+
+def test_cancelled_leader_does_not_fail_waiters():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(cache.single_flight_async("k", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.single_flight_async("k", load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, leader
+
+    value, leader = asyncio.run(main())
+    assert value == "value"
+    assert leader.cancelled()
+    assert calls == [1]
+    assert "k" not in cache._ASYNC_FLIGHTS
+
+
+def test_async_l2_read_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache.enable_l2(str(tmp_path / "l2.db"))
+    try:
+        cache.set("persisted", {"a": 1}, ttl_seconds=60, persist=True)
+        cache.flush_l2()
+        # Only the L2 copy is left
+        seg = cache._segment("persisted")
+        with seg.lock:
+            seg._remove("persisted")
+
+        threads = []
+        real_get = cache._l2_get
+        monkeypatch.setattr(cache, "_l2_get", lambda *a: threads.append(threading.current_thread()) or real_get(*a))
+
+        async def main():
+            async def load():
+                raise AssertionError("should come from L2")
+            return await cache.get_or_load_async("persisted", load, ttl_seconds=60), threading.current_thread()
+
+        value, loop_thread = asyncio.run(main())
+        assert value == {"a": 1}
+        assert threads and all(t is not loop_thread for t in threads)
+    finally:
+        cache.disable_l2()
+        cache.clear()
+
+
+def test_delete_and_clear_do_not_wait_for_the_l2_queue(tmp_path, monkeypatch):
+    cache.enable_l2(str(tmp_path / "l2.db"))
+    try:
+        for key in ("a", "b"):
+            cache.set(key, key, ttl_seconds=60, persist=True)
+        cache.flush_l2()
+
+        def no_drain():
+            raise AssertionError("delete/clear must not drain the write-behind queue")
+
+        monkeypatch.setattr(cache, "flush_l2", no_drain)
+        cache.delete("a")
+        # The L2 row may still be on disk; its tombstone hides it
+        assert cache.get("a") is None
+        assert cache.get("b") == "b"
+        cache.clear()
+        assert cache.get("b") is None
+
+        monkeypatch.undo()
+        cache.flush_l2()
+        assert not cache._L2_PENDING_DELETES and not cache._L2_PENDING_CLEARS
+        assert cache._l2_get("a", time.time()) is None
+        assert cache._l2_get("b", time.time()) is None
+    finally:
+        cache.disable_l2()
+        cache.clear()
+
+
+@pytest.mark.parametrize("race", ["delete", "set", "clear"])
+def test_write_during_l2_read_is_not_undone_by_promote(tmp_path, monkeypatch, race):
+    cache.enable_l2(str(tmp_path / "l2.db"))
+    try:
+        cache.set("k", "old", ttl_seconds=60, persist=True)
+        cache.flush_l2()
+        seg = cache._segment("k")
+        with seg.lock:
+            seg._remove("k")
+
+        real_get = cache._l2_get
+
+        def read_then_race(key, now):
+            row = real_get(key, now)
+            # Lands after the SQLite read, before the row is promoted into L1
+            if race == "delete":
+                cache.delete(key)
+            elif race == "set":
+                cache.set(key, "new", ttl_seconds=60)
+            else:
+                cache.clear()
+            return row
+
+        monkeypatch.setattr(cache, "_l2_get", read_then_race)
+        assert cache.get("k") == "old"  # the racing read itself may see the old row
+        monkeypatch.undo()
+
+        assert cache.get("k") == ("new" if race == "set" else None)
+    finally:
+        cache.disable_l2()
+        cache.clear()
+
+
+def test_persisted_set_encodes_the_value_once(tmp_path, monkeypatch):
+    cache.enable_l2(str(tmp_path / "l2.db"))
+    try:
+        assert cache.CACHE_MAX_BYTES  # byte tracking is on by default
+        calls = []
+        real_dumps = cache.json.dumps
+        monkeypatch.setattr(cache.json, "dumps", lambda *a, **kw: calls.append(1) or real_dumps(*a, **kw))
+        cache.set("k", {"a": [1, 2, 3]}, ttl_seconds=60, persist=True)
+        monkeypatch.undo()
+        assert len(calls) == 1
+        cache.flush_l2()
+        assert cache._l2_get("k", time.time())[0] == {"a": [1, 2, 3]}
+    finally:
+        cache.disable_l2()
+        cache.clear()
+
+
+def test_stats_reports_stale_if_error_entries_separately():
+    cache.clear()
+    cache.set("fresh", 1, ttl_seconds=60)
+    cache.set("fallback", 2, ttl_seconds=60, stale_if_error_seconds=600)
+    seg = cache._segment("fallback")
+    with seg.lock:
+        value, expires_at, nbytes, _, _ = seg.entries["fallback"]
+        past = time.time() - 1
+        seg.entries["fallback"] = (value, expires_at, nbytes, past, past)
+
+    stats = cache.stats()
+    assert cache.size() == 2
+    assert stats["entries"] == 2
+    assert stats["entries_stale_if_error"] == 1
+    cache.clear()
@@ -0,0 +1,50 @@
+# backend/tests/test_db.py
+
+import time
+
+import pytest
+
+import db
+import stores
+
+
+@pytest.fixture(autouse=True)
+def tmp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "test.db")
+    db.init_db()
+
+
+def _place(place_id, lat, lng):
+    return {"place_id": place_id, "name": place_id, "geometry": {"location": {"lat": lat, "lng": lng}}}
+
+
+def _index(places, searched_at):
+    db.upsert_stores(places, searched_at=searched_at)
+    db.record_store_search(40.0, -74.0, 5.0, searched_at=searched_at)
+
+
+def test_store_missing_from_later_search_is_not_served():
+    now = time.time()
+    _index([_place("a", 40.0, -74.0), _place("closed", 40.01, -74.01)], now - 100)
+    _index([_place("a", 40.0, -74.0)], now)
+
+    searched_at = db.fresh_store_search_at(40.0, -74.0, 2.0, 3600)
+    assert searched_at == now
+    assert [p["place_id"] for p in db.stores_within(40.0, -74.0, 2.0, since=searched_at)] == ["a"]
+    # ...and the later search pruned it from the index
+    assert [p["place_id"] for p in db.stores_within(40.0, -74.0, 2.0)] == ["a"]
+
+
+def test_stores_outside_the_search_are_kept():
+    now = time.time()
+    db.upsert_stores([_place("far", 41.0, -74.0)], searched_at=now - 100)
+    _index([_place("a", 40.0, -74.0)], now)
+
+    assert [p["place_id"] for p in db.stores_within(41.0, -74.0, 1.0)] == ["far"]
+
+
+def test_local_nearby_stores_uses_covering_search():
+    now = time.time()
+    _index([_place("a", 40.0, -74.0), _place("b", 40.02, -74.0)], now)
+    assert sorted(p["place_id"] for p in stores.local_nearby_stores(40.0, -74.0, 3.0)) == ["a", "b"]
+    assert stores.local_nearby_stores(45.0, -74.0, 3.0) is None
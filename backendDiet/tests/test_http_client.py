@@ -0,0 +1,70 @@
+# backend/tests/test_http_client.py
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"" if self.path.startswith("/empty") else b'{"status": "OK"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=[True, False], ids=["httpx", "sync-fallback"])
+def backend(request, monkeypatch):
+    if request.param and not http_client._HAS_HTTPX:
+        pytest.skip("httpx not installed")
+    monkeypatch.setattr(http_client, "_HAS_HTTPX", request.param)
+    yield
+    http_client.close()
+
+
+def test_empty_success_body_raises_decode_error(server_url, backend):
+    async def main():
+        try:
+            await http_client.aget(f"{server_url}/empty")
+        finally:
+            await http_client.aclose()
+
+    with pytest.raises(requests.JSONDecodeError):
+        asyncio.run(main())
+
+
+def test_aget_works_across_event_loops(server_url, backend):
+    # No aclose() between runs: the second loop must not reuse the first
+    # loop's client or semaphores
+    async def main():
+        resp = await http_client.aget(f"{server_url}/json")
+        resp.raise_for_status()
+        return resp.json()
+
+    try:
+        assert asyncio.run(main()) == {"status": "OK"}
+        assert asyncio.run(main()) == {"status": "OK"}
+    finally:
+        asyncio.run(http_client.aclose())
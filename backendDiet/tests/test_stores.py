@@ -0,0 +1,96 @@
+# backend/tests/test_stores.py
+
+import pytest
+
+import maps
+import stores
+
+
+@pytest.mark.parametrize("name, aisle", [
+    ("eggplant", "produce"),
+    ("graham crackers", "pantry"),
+    ("hamburger buns", "bakery"),
+    ("black pepper", "pantry"),
+    ("bell pepper", "produce"),
+    ("peanut butter", "pantry"),
+    ("butter", "dairy_eggs"),
+    ("eggs", "dairy_eggs"),
+    ("sliced ham", "meat_seafood"),
+    ("blueberries", "produce"),
+    ("dragon fruit", stores.OTHER_AISLE),
+])
+def test_ingredient_aisle_matches_whole_words(name, aisle):
+    assert stores._ingredient_aisle(name) == aisle
+
+
+def test_whole_foods_is_a_supermarket_with_meat():
+    category = stores.store_category(["supermarket", "grocery_or_supermarket"], "Whole Foods Market", 3)
+    assert category == "supermarket_premium"
+
+    needed = stores.ingredient_set([{"ingredients": ["ground beef", "chicken breast"]}])
+    coverage, missing = stores.ingredient_coverage(needed, category)
+    assert coverage == 100.0
+    assert needed.names(missing) == []
+
+
+def test_client_ingredients_are_not_interned():
+    stores.register_ingredients(["eggs"])
+    interned = len(stores._INGREDIENT_NAMES)
+
+    needed = stores.ingredient_set([{"ingredients": ["Eggs", "unheard-of root 123", "eggplant"]}])
+    assert len(stores._INGREDIENT_NAMES) == interned
+    assert needed.local_names == ("unheard-of root 123", "eggplant")
+
+    coverage, missing = stores.ingredient_coverage(needed, "convenience")
+    assert coverage == pytest.approx(33.3)
+    assert sorted(needed.names(missing)) == ["eggplant", "unheard-of root 123"]
+
+
+@pytest.mark.parametrize("lat", [0.0, 40.0, 60.0, 80.0, 89.99, -89.99])
+@pytest.mark.parametrize("radius_km", [1, 5, 40, 45, 49.9, 50])
+def test_places_cell_fetch_covers_the_user_circle(lat, radius_km):
+    radius_m = int(radius_km * 1000)
+    for lng in (-179.99, -74.00601, 13.37, 157.1, 179.999):
+        cell, cell_lat, cell_lng, fetch_radius_m = stores._places_cell(lat, lng, radius_m)
+        assert fetch_radius_m <= stores.PLACES_MAX_RADIUS_M
+        # 2 m slack only for the ~1 m rounding of a user-centered 50 km search
+        slack_m = 2 if radius_m + 2 > stores.PLACES_MAX_RADIUS_M else 0
+        offset_m = maps.distance_km(lat, lng, cell_lat, cell_lng) * 1000
+        assert offset_m + radius_m <= fetch_radius_m + slack_m, cell
+
+
+def test_concurrent_streams_share_one_places_fetch(monkeypatch):
+    import asyncio
+
+    import cache
+
+    calls = []
+
+    async def fake_search(lat, lng, radius_m, search):
+        for page in range(2):
+            calls.append(search["type"])
+            await asyncio.sleep(0.01)
+            yield [{
+                "place_id": f"{search['type']}-{page}",
+                "name": "Store",
+                "types": ["supermarket"],
+                "geometry": {"location": {"lat": lat, "lng": lng}},
+            }], False
+
+    monkeypatch.setattr(stores, "_search_places_async", fake_search)
+    monkeypatch.setattr(stores, "_record_places", lambda *args: None)
+    cache.clear()
+
+    async def consume():
+        return [st["place_id"] async for batch in stores.stream_stores(40.0, -74.0, radius_km=5) for st in batch]
+
+    async def main():
+        return await asyncio.gather(*(consume() for _ in range(3)))
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        cache.clear()
+    assert len(calls) == 2 * len(stores.PLACES_SEARCHES)
+    assert all(sorted(r) == sorted(results[0]) and len(r) == 2 * len(stores.PLACES_SEARCHES) for r in results)
+    assert stores._PLACES_FEEDS == {}